@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Benchmark of xml backends. Document has many paragraphs with variable in each one.
+Stages are parsing of xml, enforcing of tree and writing of tree.
+"""
+import sys
+from argparse import ArgumentParser
+from io import BytesIO
+from time import perf_counter
+
+from straighten import NAMESPACE
+
+from saganineeleven.contrib import django, docx, elementtree
+from saganineeleven.executor import delineate_boundaries, enforce
+from saganineeleven.straighten import straighten
+from saganineeleven.stringify import parse, stringify
+
+SIZES = 1_000, 10_000
+PARAGRAPH = '<w:p><w:pPr><w:pStyle w:val="Normal"/></w:pPr><w:r><w:rPr/><w:t>Paragraph {} of {{{{ name }}}}.</w:t></w:r></w:p>'
+
+
+def make_document(size: int) -> bytes:
+	paragraphs = ''.join(map(PARAGRAPH.format, range(size)))
+	return f'<?xml version="1.0" encoding="UTF-8"?><w:document xmlns:w="{NAMESPACE}"><w:body>{paragraphs}</w:body></w:document>'.encode()
+
+
+def measure(backend, data: bytes) -> dict:
+	timings = {}
+	start = perf_counter()
+	root = backend.fromstring(data)
+	timings['parse'] = perf_counter() - start
+
+	_, line = straighten(root, django.Lexer, docx.text_nodes, docx.convert)
+	boundaries = delineate_boundaries(root, line)
+	template, table = stringify(line)
+	tape = list(parse(django.render(template, {'name': 'saganineeleven'}), table))
+
+	start = perf_counter()
+	builder = enforce(root, tape, boundaries, docx.processor_factory)
+	timings['enforce'] = perf_counter() - start
+
+	start = perf_counter()
+	backend.write(builder.destination, BytesIO())
+	timings['write'] = perf_counter() - start
+	return timings
+
+
+def main(options):
+	backends = [elementtree]
+	try:
+		from saganineeleven.contrib import lxml
+		backends.append(lxml)
+	except ImportError:
+		print('lxml is not installed.', file=sys.stderr)
+
+	stages = 'parse', 'enforce', 'write'
+	print(f'{"paragraphs":>10} {"backend":>12}', *(f'{s + ", s":>10}' for s in stages))
+	for size in options.sizes:
+		data = make_document(size)
+		for backend in backends:
+			best = {}
+			for _ in range(options.repeat):
+				for stage, value in measure(backend, data).items():
+					best[stage] = min(best.get(stage, value), value)
+			name = backend.__name__.rsplit('.', 1)[-1]
+			print(f'{size:>10} {name:>12}', *(f'{best[s]:>10.3f}' for s in stages))
+
+
+if __name__ == '__main__':
+	parser = ArgumentParser()
+	parser.add_argument('sizes', nargs='*', type=int, default=SIZES)
+	parser.add_argument('--repeat', type=int, default=3)
+	sys.exit(main(parser.parse_args()))
@@ -0,0 +1,42 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark of elementstr slicing. Lexer slices buffer once per text and once per terminal.
+Time of one slice must not depend on count of elements in buffer.
+"""
+import sys
+from argparse import ArgumentParser
+from timeit import Timer
+
+from saganineeleven.straighten import ShadowElement, elementstr
+
+SIZES = 10, 1_000, 100_000
+TEXT = 'I love you.'
+
+
+def make_buffer(size: int) -> elementstr:
+	element = ShadowElement((0, 0), -1, len(TEXT), 0, len(TEXT), True)
+	buffer = elementstr(TEXT * size)
+	buffer.elements = (element,) * size
+	return buffer
+
+
+def main(options):
+	print(f'{"elements":>10} {"head, µs":>10} {"middle, µs":>10} {"tail, µs":>10} {"index, ms":>10}')
+	for size in options.sizes:
+		buffer = make_buffer(size)
+		# Index is built once for buffer on first slicing.
+		timer = Timer(buffer.get_ends, setup=lambda: setattr(buffer, 'cumulative', None))
+		index = min(timer.repeat(options.repeat, 1)) * 1e3
+		row = []
+		for position in 1, len(buffer) // 2, len(buffer) - len(TEXT):
+			timer = Timer(lambda: buffer[position:position+len(TEXT)])
+			row.append(min(timer.repeat(options.repeat, options.number)) / options.number * 1e6)
+		print(f'{size:>10} {row[0]:>10.2f} {row[1]:>10.2f} {row[2]:>10.2f} {index:>10.2f}')
+
+
+if __name__ == '__main__':
+	parser = ArgumentParser()
+	parser.add_argument('sizes', nargs='*', type=int, default=SIZES)
+	parser.add_argument('--number', type=int, default=1_000)
+	parser.add_argument('--repeat', type=int, default=5)
+	sys.exit(main(parser.parse_args()))
@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""
+Benchmark of template handlers. Template is a table row in loop, document is made of many rows.
+Stages are rendering of template string and whole rendering of compiled document.
+"""
+import sys
+from argparse import ArgumentParser
+from io import BytesIO
+from pathlib import Path
+from time import perf_counter
+from zipfile import ZipFile
+
+from django.conf import settings
+
+from saganineeleven import compile
+from saganineeleven.contrib import django, docx, jinja2
+
+SIZES = 100, 1_000, 10_000
+FIXTURE = Path(__file__).absolute().parent.parent / 'tests' / 'fixture' / 'loop_cell.docx.xml'
+
+
+def make_docx() -> BytesIO:
+	stream = BytesIO()
+	with ZipFile(stream, 'w') as archive:
+		archive.writestr('word/document.xml', FIXTURE.read_text().replace("'ABC'", 'items'))
+	stream.seek(0)
+	return stream
+
+
+def best(repeat: int, function, *args) -> float:
+	timings = []
+	for _ in range(repeat):
+		start = perf_counter()
+		function(*args)
+		timings.append(perf_counter() - start)
+	return min(timings)
+
+
+def main(options):
+	settings.configure()
+	handlers = django, jinja2
+	stages = 'template', 'document'
+	print(f'{"rows":>10} {"handler":>10}', *(f'{s + ", s":>12}' for s in stages))
+	for size in options.sizes:
+		context = {'items': [f'row {i}' for i in range(size)]}
+		for handler in handlers:
+			compiled = compile(make_docx(), docx, handler)
+			document, = compiled.parts
+			# First rendering compiles template, it is not measured.
+			handler.render(document.template, context)
+			timings = (
+				best(options.repeat, handler.render, document.template, context),
+				best(options.repeat, compiled.render, context, BytesIO()),
+			)
+			name = handler.__name__.rsplit('.', 1)[-1]
+			print(f'{size:>10} {name:>10}', *(f'{t:>12.4f}' for t in timings))
+
+
+if __name__ == '__main__':
+	parser = ArgumentParser()
+	parser.add_argument('sizes', nargs='*', type=int, default=SIZES)
+	parser.add_argument('--repeat', type=int, default=3)
+	sys.exit(main(parser.parse_args()))
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+Benchmark of render pipeline stage by stage. Documents are fixtures of tests and synthetic documents of given sizes.
+Result is json, it is compared between releases to see regression of any stage.
+
+Stages are separated here. Real render fuses parsing with straighten (iterstraighten) and enforce with serialization
+(StreamingTreeBuilder), fused stages are measured also.
+"""
+import json
+import platform
+import sys
+from argparse import ArgumentParser, FileType
+from dataclasses import replace
+from importlib import import_module
+from io import BytesIO
+from pathlib import Path
+from time import perf_counter
+from zipfile import ZIP_DEFLATED, ZipFile
+
+from saganineeleven.contrib import docx, elementtree, synthetic
+from saganineeleven.executor import StreamingTreeBuilder, delineate_boundaries, enforce
+from saganineeleven.straighten import iterstraighten, straighten
+from saganineeleven.stringify import parse, stringify
+
+SIZES = 1_000, 10_000
+FIXTURE_PATH = Path(__file__).absolute().parent.parent / 'tests' / 'fixture'
+MEMBER = 'word/document.xml'
+# Shape of synthetic documents, paragraphs are given by sizes.
+SHAPE = synthetic.Shape(split=.1, loops=.05, conditions=.05)
+CONTEXT = {'var1': 'Hello,', 'var2': 'Prince', **synthetic.make_context(SHAPE)}
+STAGES = (
+	'zip_read', 'xml_parse', 'straighten', 'delineate_boundaries', 'stringify', 'template_render', 'parse', 'enforce',
+	'serialization', 'zip_write', 'iterstraighten', 'enforce_stream',
+)
+
+
+def make_docx(data: bytes) -> bytes:
+	stream = BytesIO()
+	with ZipFile(stream, 'w') as archive:
+		archive.writestr(MEMBER, data, ZIP_DEFLATED)
+	return stream.getvalue()
+
+
+def iter_documents(sizes):
+	for path in sorted(FIXTURE_PATH.glob('*.docx.xml')):
+		yield path.name.split('.')[0], make_docx(path.read_bytes())
+	for size in sizes:
+		yield f'synthetic-{size}', make_docx(synthetic.make_content(replace(SHAPE, paragraphs=size)))
+
+
+def run(archive: bytes, template_handler) -> dict:
+	"Run pipeline once. Return seconds of each stage."
+	timings = {}
+	clock = perf_counter()
+
+	def lap(stage):
+		nonlocal clock
+		now = perf_counter()
+		timings[stage] = now - clock
+		clock = now
+
+	with ZipFile(BytesIO(archive)) as source:
+		data = source.read(MEMBER)
+	lap('zip_read')
+	root = elementtree.fromstring(data)
+	lap('xml_parse')
+	_, line = straighten(root, template_handler.Lexer, docx.text_nodes, docx.convert)
+	lap('straighten')
+	boundaries = delineate_boundaries(root, line)
+	lap('delineate_boundaries')
+	template, table = stringify(line)
+	lap('stringify')
+	rendered = template_handler.render(template, CONTEXT)
+	lap('template_render')
+	tape = list(parse(rendered, table))
+	lap('parse')
+	builder = enforce(root, tape, boundaries, docx.processor_factory)
+	lap('enforce')
+	output = BytesIO()
+	elementtree.write(builder.destination, output)
+	lap('serialization')
+	with ZipFile(BytesIO(), 'w') as destination:
+		destination.writestr(MEMBER, output.getvalue(), ZIP_DEFLATED)
+	lap('zip_write')
+
+	iterstraighten(BytesIO(data), template_handler.Lexer, docx.text_nodes, docx.convert)
+	lap('iterstraighten')
+	enforce(root, tape, boundaries, docx.processor_factory, StreamingTreeBuilder(root, elementtree.Writer(root, BytesIO())))
+	lap('enforce_stream')
+	return timings
+
+
+def measure(archive: bytes, template_handler, repeat: int) -> dict:
+	"Best time of each stage."
+	best = {}
+	for _ in range(repeat):
+		for stage, seconds in run(archive, template_handler).items():
+			best[stage] = min(best.get(stage, seconds), seconds)
+	return best
+
+
+def main(options):
+	template_handler = import_module(f'saganineeleven.contrib.{options.template_handler}')
+	results = []
+	for name, archive in iter_documents(options.sizes):
+		result = {'document': name, 'size': len(archive)}
+		try:
+			result['stages'] = measure(archive, template_handler, options.repeat)
+		except Exception as error:
+			# Fixture can use syntax of other template engine.
+			result['error'] = f'{type(error).__name__}: {error}'
+		results.append(result)
+		print(name, file=sys.stderr)
+
+	report = {
+		'python': platform.python_version(),
+		'implementation': platform.python_implementation(),
+		'machine': platform.machine(),
+		'template_handler': options.template_handler,
+		'repeat': options.repeat,
+		'stages': STAGES,
+		'results': results,
+	}
+	json.dump(report, options.output, indent='\t')
+	options.output.write('\n')
+
+
+if __name__ == '__main__':
+	parser = ArgumentParser()
+	parser.add_argument('sizes', nargs='*', type=int, default=SIZES, help='Paragraphs of synthetic documents.')
+	parser.add_argument('--repeat', type=int, default=3)
+	parser.add_argument('--template-handler', default='django', choices=('django', 'jinja2'))
+	parser.add_argument('--output', type=FileType('w'), default=sys.stdout, help='Json file, stdout by default.')
+	sys.exit(main(parser.parse_args()))
@@ -0,0 +1,40 @@
+#!/usr/bin/env python3
+"""
+Benchmark of straighten on wide synthetic body. Body has many paragraphs with one run in each.
+Time must grow linearly with count of paragraphs.
+"""
+import sys
+from argparse import ArgumentParser
+from time import perf_counter
+from xml.etree.ElementTree import fromstring
+
+from saganineeleven.contrib import django, docx
+from saganineeleven.straighten import straighten
+
+SIZES = 1_000, 10_000, 50_000
+NAMESPACE = 'http://schemas.openxmlformats.org/wordprocessingml/2006/main'
+PARAGRAPH = '<w:p><w:pPr><w:pStyle w:val="Normal"/></w:pPr><w:r><w:rPr/><w:t>Paragraph {}.</w:t></w:r></w:p>'
+
+
+def make_document(size: int) -> str:
+	paragraphs = ''.join(map(PARAGRAPH.format, range(size)))
+	return f'<w:document xmlns:w="{NAMESPACE}"><w:body>{paragraphs}</w:body></w:document>'
+
+
+def main(options):
+	print(f'{"paragraphs":>10} {"seconds":>10} {"µs per paragraph":>18}')
+	for size in options.sizes:
+		root = fromstring(make_document(size))
+		best = float('inf')
+		for _ in range(options.repeat):
+			start = perf_counter()
+			straighten(root, django.Lexer, docx.text_nodes, docx.convert)
+			best = min(best, perf_counter() - start)
+		print(f'{size:>10} {best:>10.3f} {best / size * 1e6:>18.2f}')
+
+
+if __name__ == '__main__':
+	parser = ArgumentParser()
+	parser.add_argument('sizes', nargs='*', type=int, default=SIZES)
+	parser.add_argument('--repeat', type=int, default=3)
+	sys.exit(main(parser.parse_args()))
@@ -1,58 +1,28 @@
-from typing import BinaryIO, Mapping, Callable
-
-from typing_extensions import Protocol
-
-from .straighten import straighten, LexerProtocol
-from .executor import delineate_boundaries, enforce
-from xml.etree.ElementTree import parse as xml_parse, ElementTree
-
-from .stringify import stringify, parse
-
-
-class DocumentHandler(Protocol):
-	text_nodes: Mapping
-	convert: Callable
-	processor_factory: Callable
-	open: Callable
-	iter: Callable
-	create: Callable
-
-
-class TemplateHandler(Protocol):
-	Lexer: LexerProtocol
-	render: Callable
-
-
-def copy(source, destination):
-	for chunk in iter(lambda: source.read(4*1024), b''):
-		destination.write(chunk)
-
-
-def render(
-	source: BinaryIO,
-	destination: BinaryIO,
-	document_handler: DocumentHandler,
-	template_handler: TemplateHandler,
-	context: dict
-):
-	with document_handler.create(destination) as archive:
-		for source_file in document_handler.iter(source):
-			with source_file, document_handler.open(archive, source_file.name) as destination_file:
-				if not source_file.name.endswith('.xml'):
-					copy(source_file, destination_file)
-					continue
-
-				origin_tree = xml_parse(source_file)
-				origin_root = origin_tree.getroot()
-				content, line = straighten(origin_root, template_handler.Lexer, document_handler.text_nodes, document_handler.convert)
-				if content is not content.template:
-					source_file.seek(0)
-					copy(source_file, destination_file)
-					continue
-
-				boundaries = delineate_boundaries(origin_root, line)
-				template = stringify(line)
-				tape = parse(template_handler.render(template, context))
-				builder = enforce(origin_root, tape, boundaries, document_handler.processor_factory)
-				# XXX: etree does not store original parameters of xml.
-				ElementTree(builder.destination).write(destination_file, encoding='utf-8', xml_declaration=True)
+"""
+Names of package are imported from submodules on first access. Import of package itself is cheap,
+command line interface and thin client do not pay for xml machinery they do not use.
+"""
+from importlib import import_module
+
+# Name of public object to name of submodule.
+EXPORTS = {
+	name: 'document'
+	for name in (
+		'DocumentHandler', 'XmlBackend', 'TemplateHandler', 'Part', 'CompiledTemplate',
+		'make_digest', 'prepare', 'make_part', 'write_part', 'render_part', 'compile', 'render',
+	)
+}
+
+
+def __getattr__(name):
+	module = EXPORTS.get(name)
+	if module is None:
+		# Submodules are imported by import machinery after AttributeError.
+		raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+	value = getattr(import_module(f'.{module}', __name__), name)
+	globals()[name] = value
+	return value
+
+
+def __dir__():
+	return sorted(set(globals()) | set(EXPORTS))
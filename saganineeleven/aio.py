@@ -0,0 +1,155 @@
+# Copyright 2021 Stepan Bakshayev
+#
+# This file is part of saganineeleven.
+#
+# saganineeleven is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License.
+#
+# saganineeleven is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with saganineeleven.  If not, see <https://www.gnu.org/licenses/>.
+"""
+Asyncio variants of compile and render. Event loop is not blocked: parsing, rendering and writing of archive go
+to thread of runner, it is default executor of loop if runner is not given. Runner is pool of threads usually,
+handlers are modules and they are not pickled for pool of processes. Executor is for parts only,
+parts are prepared and rendered by executor if it is given like synchronous variants do.
+
+Source is read from async stream, destination is written by async stream. Destination gets archive only after
+rendering is complete. Cancelled render writes nothing. Work is not started yet is cancelled, work is already started
+in thread is finished in background and its result is dropped.
+
+Semaphore limits count of documents are compiled or rendered at once. Other ones wait for their turn.
+Turn of cancelled render is over when its work in thread is finished, not when it is cancelled.
+"""
+from asyncio import CancelledError, Semaphore, get_running_loop, shield
+from concurrent.futures import Executor
+from functools import partial
+from inspect import isawaitable
+from io import BytesIO
+from typing import Callable, Optional
+
+from typing_extensions import Protocol
+
+from .document import CompiledTemplate, DocumentHandler, TemplateHandler, XmlBackend
+from .document import compile as sync_compile
+from .contrib import elementtree
+
+
+class AsyncReader(Protocol):
+	async def read(self, n: int = -1) -> bytes:
+		...
+
+
+class AsyncWriter(Protocol):
+	"It is asyncio.StreamWriter with write and drain or file with awaitable write."
+	def write(self, data: bytes):
+		...
+
+
+async def read(source: AsyncReader) -> bytes:
+	return await source.read()
+
+
+async def write(destination: AsyncWriter, data: bytes):
+	result = destination.write(data)
+	if isawaitable(result):
+		await result
+	drain = getattr(destination, 'drain', None)
+	if drain is not None:
+		await drain()
+
+
+async def run(semaphore: Optional[Semaphore], runner: Optional[Executor], function: Callable, *args):
+	"Run function in thread of runner or default executor of loop."
+	loop = get_running_loop()
+	if semaphore is None:
+		return await loop.run_in_executor(runner, partial(function, *args))
+
+	await semaphore.acquire()
+	cancelled = False
+
+	def call():
+		# Work is not started yet, task is cancelled already.
+		if cancelled:
+			return None
+		return function(*args)
+
+	try:
+		future = loop.run_in_executor(runner, call)
+	except BaseException:
+		semaphore.release()
+		raise
+	# Permit is held till work in thread is finished. Cancellation of task does not stop thread.
+	future.add_done_callback(lambda _: semaphore.release())
+	try:
+		return await shield(future)
+	except CancelledError:
+		cancelled = True
+		raise
+
+
+def render_compiled_bytes(template: CompiledTemplate, context: dict, executor: Optional[Executor]) -> bytes:
+	stream = BytesIO()
+	template.render(context, stream, executor)
+	return stream.getvalue()
+
+
+async def compile(
+	source: AsyncReader,
+	document_handler: DocumentHandler,
+	template_handler: TemplateHandler,
+	previous: Optional[CompiledTemplate] = None,
+	executor: Optional[Executor] = None,
+	backend: XmlBackend = elementtree,
+	semaphore: Optional[Semaphore] = None,
+	runner: Optional[Executor] = None,
+) -> CompiledTemplate:
+	data = await read(source)
+	return await run(semaphore, runner, sync_compile, BytesIO(data), document_handler, template_handler, previous, executor, backend)
+
+
+async def render_compiled(
+	template: CompiledTemplate,
+	context: dict,
+	destination: AsyncWriter,
+	executor: Optional[Executor] = None,
+	semaphore: Optional[Semaphore] = None,
+	runner: Optional[Executor] = None,
+):
+	"Variant of CompiledTemplate.render."
+	data = await run(semaphore, runner, render_compiled_bytes, template, context, executor)
+	await write(destination, data)
+
+
+def render_bytes(
+	data: bytes,
+	document_handler: DocumentHandler,
+	template_handler: TemplateHandler,
+	context: dict,
+	executor: Optional[Executor],
+	backend: XmlBackend,
+) -> bytes:
+	template = sync_compile(BytesIO(data), document_handler, template_handler, executor=executor, backend=backend)
+	return render_compiled_bytes(template, context, executor)
+
+
+async def render(
+	source: AsyncReader,
+	destination: AsyncWriter,
+	document_handler: DocumentHandler,
+	template_handler: TemplateHandler,
+	context: dict,
+	executor: Optional[Executor] = None,
+	backend: XmlBackend = elementtree,
+	semaphore: Optional[Semaphore] = None,
+	runner: Optional[Executor] = None,
+):
+	"Document is compiled and rendered under one turn of semaphore."
+	data = await read(source)
+	data = await run(semaphore, runner, render_bytes, data, document_handler, template_handler, context, executor, backend)
+	await write(destination, data)
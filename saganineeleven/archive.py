@@ -0,0 +1,87 @@
+# Copyright 2021 Stepan Bakshayev
+#
+# This file is part of saganineeleven.
+#
+# saganineeleven is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License.
+#
+# saganineeleven is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with saganineeleven.  If not, see <https://www.gnu.org/licenses/>.
+"""
+Zip members without templates are copied as is. Compressed bytes go from source to destination archive with
+original CRC and sizes. There is no decompression and no compression again.
+
+Module uses private API of zipfile. Each python version can change details of implementation.
+"""
+import struct
+from copy import copy
+from dataclasses import dataclass
+from zipfile import BadZipFile, ZipFile, ZipInfo, sizeFileHeader, stringFileHeader, structFileHeader
+
+# Indexes in local file header.
+FH_SIGNATURE = 0
+FH_FILENAME_LENGTH = 10
+FH_EXTRA_FIELD_LENGTH = 11
+
+MASK_USE_DATA_DESCRIPTOR = 1 << 3
+ZIP64_EXTRA = 1
+
+
+@dataclass(frozen=True)
+class Member:
+	archive: ZipFile
+	info: ZipInfo
+
+	@property
+	def name(self) -> str:
+		return self.info.filename
+
+	def read(self) -> bytes:
+		return self.archive.read(self.info)
+
+	def read_raw(self) -> bytes:
+		"Read compressed data of member."
+		stream = self.archive.fp
+		stream.seek(self.info.header_offset)
+		header = struct.unpack(structFileHeader, stream.read(sizeFileHeader))
+		if header[FH_SIGNATURE] != stringFileHeader:
+			raise BadZipFile(f'Bad magic number for file header of {self.info.filename}.')
+		stream.seek(header[FH_FILENAME_LENGTH] + header[FH_EXTRA_FIELD_LENGTH], 1)
+		return stream.read(self.info.compress_size)
+
+
+def strip_zip64(extra: bytes) -> bytes:
+	"Zip64 extra field is made again by zipfile on writing."
+	chunks = []
+	position = 0
+	while position + 4 <= len(extra):
+		kind, length = struct.unpack('<HH', extra[position:position+4])
+		end = position + 4 + length
+		if kind != ZIP64_EXTRA:
+			chunks.append(extra[position:end])
+		position = end
+	return b''.join(chunks)
+
+
+def write_raw(archive: ZipFile, info: ZipInfo, payload: bytes):
+	"Write compressed data of member. It mimics ZipFile._open_to_write and _ZipWriteFile.close."
+	info = copy(info)
+	# Sizes are known before data, descriptor after data is not required.
+	info.flag_bits &= ~MASK_USE_DATA_DESCRIPTOR
+	info.extra = strip_zip64(info.extra)
+	if archive._seekable:
+		archive.fp.seek(archive.start_dir)
+	info.header_offset = archive.fp.tell()
+	archive._writecheck(info)
+	archive._didModify = True
+	archive.fp.write(info.FileHeader())
+	archive.fp.write(payload)
+	archive.start_dir = archive.fp.tell()
+	archive.filelist.append(info)
+	archive.NameToInfo[info.filename] = info
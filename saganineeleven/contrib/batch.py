@@ -0,0 +1,163 @@
+# Copyright 2021 Stepan Bakshayev
+#
+# This file is part of saganineeleven.
+#
+# saganineeleven is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License.
+#
+# saganineeleven is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with saganineeleven.  If not, see <https://www.gnu.org/licenses/>.
+"""
+Batch renders one template with many contexts. Contexts are read from json lines or msgpack stream one by one.
+
+Documents are written by pattern of names or into one zip bundle. Pattern is formatted with index of context and
+keys of context, for example `statement-{index}.docx` or `{account}.docx`.
+Workers are processes. Each worker compiles template once in initializer and renders contexts by order of parent.
+Count of contexts in flight is limited, stream of contexts is not read ahead completely.
+Bad record (broken json, not an object, missing key of pattern) is failure of its index, batch goes on.
+"""
+import json
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from importlib import import_module
+from io import BytesIO
+from time import perf_counter
+from typing import BinaryIO, Iterable, Iterator, List, Optional, Tuple, Union
+from zipfile import ZIP_STORED, ZipFile
+
+from saganineeleven.document import CompiledTemplate, compile
+
+# Contexts in flight per worker.
+WINDOW = 4
+FORMATS = 'jsonl', 'msgpack'
+
+
+def iter_contexts(stream: BinaryIO, format: str = 'jsonl') -> Iterator[Union[dict, bytes]]:
+	"Lines of json are yielded as is. They are parsed by batch one by one, broken line fails only its index."
+	if format == 'jsonl':
+		for line in stream:
+			if line.strip():
+				yield line
+	elif format == 'msgpack':
+		import msgpack
+		yield from msgpack.Unpacker(stream, raw=False)
+	else:
+		raise RuntimeError(f'Unknown format {format}. Supported {FORMATS}.', format, FORMATS)
+
+
+def load_context(record: Union[dict, bytes]) -> dict:
+	context = json.loads(record) if isinstance(record, (bytes, str)) else record
+	if not isinstance(context, dict):
+		raise TypeError(f'Context must be object, not {type(context).__name__}.', context)
+	return context
+
+
+def make_name(pattern: str, index: int, context: dict) -> str:
+	return pattern.format_map({**context, 'index': index})
+
+
+# Template of worker process. It is compiled once by initializer.
+template: Optional[CompiledTemplate] = None
+
+
+def initialize(path: str, document_handler: str, template_handler: str):
+	"Handlers are names of modules, they are imported by worker."
+	global template
+	with open(path, 'rb') as stream:
+		template = compile(stream, import_module(document_handler), import_module(template_handler))
+
+
+def render(index: int, context: dict, destination: Optional[str]) -> Tuple[int, Optional[bytes], Optional[str]]:
+	"Return archive if destination is not given. Error is returned as text, it is reported by parent."
+	try:
+		stream = BytesIO()
+		template.render(context, stream)
+		if destination is None:
+			return index, stream.getvalue(), None
+		with open(destination, 'wb') as file:
+			file.write(stream.getbuffer())
+	except Exception as error:
+		return index, None, f'{type(error).__name__}: {error}'
+	return index, None, None
+
+
+@dataclass
+class Summary:
+	documents: int = 0
+	failures: List[Tuple[int, str]] = field(default_factory=list)
+	seconds: float = 0
+
+	@property
+	def throughput(self) -> float:
+		return self.documents / self.seconds if self.seconds else 0
+
+	def __str__(self):
+		return f'{self.documents} documents, {len(self.failures)} failures in {self.seconds:.2f} s, {self.throughput:.1f} documents/s'
+
+
+def render_batch(
+	path: str,
+	document_handler: str,
+	template_handler: str,
+	contexts: Iterable[Union[dict, bytes]],
+	pattern: str,
+	bundle: Optional[BinaryIO] = None,
+	jobs: int = 1,
+) -> Summary:
+	"""
+	Documents are written by pattern of names or into bundle with names by pattern if bundle is given.
+	Single job renders in this process without pool.
+	"""
+	start = perf_counter()
+	summary = Summary()
+	archive = None if bundle is None else ZipFile(bundle, 'w', ZIP_STORED)
+	names = {}
+
+	def collect(result):
+		index, data, error = result
+		name = names.pop(index)
+		if error is not None:
+			summary.failures.append((index, error))
+			return
+		summary.documents += 1
+		if archive is not None:
+			archive.writestr(name, data)
+
+	def iter_jobs():
+		for index, record in enumerate(contexts):
+			try:
+				context = load_context(record)
+				name = make_name(pattern, index, context)
+			except (KeyError, IndexError, ValueError, TypeError) as error:
+				summary.failures.append((index, f'{type(error).__name__}: {error}'))
+				continue
+			names[index] = name
+			yield index, context, None if archive is not None else name
+
+	try:
+		if jobs == 1:
+			initialize(path, document_handler, template_handler)
+			for job in iter_jobs():
+				collect(render(*job))
+		else:
+			with ProcessPoolExecutor(jobs, initializer=initialize, initargs=(path, document_handler, template_handler)) as executor:
+				flight = deque()
+				for job in iter_jobs():
+					flight.append(executor.submit(render, *job))
+					if len(flight) >= jobs * WINDOW:
+						collect(flight.popleft().result())
+				while flight:
+					collect(flight.popleft().result())
+	finally:
+		if archive is not None:
+			archive.close()
+
+	summary.seconds = perf_counter() - start
+	return summary
@@ -1,17 +1,19 @@
 import json
+import sys
 from enum import Enum
 from itertools import tee
 from pathlib import Path
+from signal import SIGTERM, default_int_handler, signal
 from importlib import import_module
+from typing import Optional
 
 import typer
 
-from saganineeleven import render as do_render
-
+# Package, handlers and their dependencies are imported by command on demand. Help does not import them.
 application = typer.Typer()
 
 DOCUMENT_HANDLER = Enum('DocumentHandlerType', zip(*tee('docx'.split(' '))), module=__name__)
-TEMPLATE_HANDLER = Enum('DocumentHandlerType', zip(*tee('django'.split(' '))), module=__name__)
+TEMPLATE_HANDLER = Enum('DocumentHandlerType', zip(*tee('django jinja2'.split(' '))), module=__name__)
 
 
 @application.command()
@@ -20,17 +22,124 @@ def render(
 	destination: Path=typer.Option(...),
 	document_handler: DOCUMENT_HANDLER=typer.Option(...),
 	template_handler: TEMPLATE_HANDLER=typer.Option(...),
-	context: str=typer.Option(...)
+	context: str=typer.Option(...),
+	trace: Optional[Path]=typer.Option(None, help='Write stages in trace event format of Chrome.'),
 ):
+	from saganineeleven import render as do_render
+
+	tracer = None
+	if trace is not None:
+		from saganineeleven.trace import ChromeTracer
+		tracer = ChromeTracer()
+
 	with source.open('rb') as source_file, destination.open('wb') as destination_file:
 		do_render(
 			source_file,
 			destination_file,
 			import_module(f'saganineeleven.contrib.{document_handler.value}'),
 			import_module(f'saganineeleven.contrib.{template_handler.value}'),
-			json.loads(context)
+			json.loads(context),
+			tracer=tracer,
+		)
+
+	if tracer is not None:
+		with trace.open('w') as trace_file:
+			tracer.write(trace_file)
+
+
+@application.command()
+def serve(
+	document_handler: DOCUMENT_HANDLER=typer.Option(...),
+	template_handler: TEMPLATE_HANDLER=typer.Option(...),
+	socket: Optional[Path]=typer.Option(None, help='Listen on unix socket. Jobs are read from stdin otherwise.'),
+	budget: Optional[int]=typer.Option(None, help='Memory for compiled templates in bytes.'),
+):
+	"Render jobs of json lines, see saganineeleven.contrib.daemon."
+	from saganineeleven.contrib.daemon import BUDGET, Daemon
+	from saganineeleven.registry import Registry
+
+	daemon = Daemon(
+		import_module(f'saganineeleven.contrib.{document_handler.value}'),
+		import_module(f'saganineeleven.contrib.{template_handler.value}'),
+		Registry(BUDGET if budget is None else budget),
+	)
+	if socket is None:
+		daemon.serve_stream(sys.stdin, sys.stdout)
+		return
+
+	# Termination is the same as interruption, socket file is removed.
+	signal(SIGTERM, default_int_handler)
+	with daemon.make_server(str(socket)) as server:
+		try:
+			server.serve_forever()
+		except KeyboardInterrupt:
+			pass
+		finally:
+			socket.unlink()
+
+
+@application.command()
+def client(
+	socket: Path=typer.Option(...),
+	template: Path=typer.Option(...),
+	destination: Path=typer.Option(...),
+	context: str=typer.Option(...),
+):
+	"Send job to daemon. Exit code is not zero if job is failed."
+	from saganineeleven.contrib.daemon import request
+
+	job = {'template': str(template.absolute()), 'destination': str(destination.absolute()), 'context': json.loads(context)}
+	reply, = request(str(socket), (job,))
+	typer.echo(json.dumps(reply))
+	if reply['status'] != 'ok':
+		raise typer.Exit(1)
+
+
+@application.command('render-batch')
+def render_batch(
+	template: Path=typer.Option(...),
+	document_handler: DOCUMENT_HANDLER=typer.Option(...),
+	template_handler: TEMPLATE_HANDLER=typer.Option(...),
+	contexts: Optional[Path]=typer.Option(None, help='Json lines or msgpack stream of contexts. Stdin is read otherwise.'),
+	format: str=typer.Option('jsonl', help='Format of contexts: jsonl or msgpack.'),
+	output: str=typer.Option('{index}.docx', help='Pattern of names, it is formatted with index and keys of context.'),
+	bundle: Optional[Path]=typer.Option(None, help='Write documents into one zip with names by output pattern.'),
+	jobs: int=typer.Option(1, help='Count of worker processes.'),
+):
+	"Render template with each context. Summary and failures are printed in the end."
+	from saganineeleven.contrib import batch
+
+	with (contexts.open('rb') if contexts is not None else sys.stdin.buffer) as contexts_file:
+		arguments = (
+			str(template),
+			f'saganineeleven.contrib.{document_handler.value}',
+			f'saganineeleven.contrib.{template_handler.value}',
+			batch.iter_contexts(contexts_file, format),
+			output,
 		)
+		if bundle is None:
+			summary = batch.render_batch(*arguments, jobs=jobs)
+		else:
+			with bundle.open('wb') as bundle_file:
+				summary = batch.render_batch(*arguments, bundle=bundle_file, jobs=jobs)
+
+	for index, error in summary.failures:
+		typer.echo(f'{index}: {error}', err=True)
+	typer.echo(str(summary), err=True)
+	if summary.failures:
+		raise typer.Exit(1)
+
+
+def main(argv: Optional[list]=None):
+	"""
+	Command render is default. Invocation of version with single command `saganineeleven --source ... --destination ...`
+	keeps working.
+	"""
+	argv = sys.argv[1:] if argv is None else argv
+	if argv and argv[0].startswith('-') and argv[0] not in ('--help', '--install-completion', '--show-completion'):
+		argv = ['render', *argv]
+	application(args=argv, prog_name='saganineeleven')
 
 
 if __name__ == '__main__':
-	application()
+	main()
@@ -0,0 +1,139 @@
+# Copyright 2021 Stepan Bakshayev
+#
+# This file is part of saganineeleven.
+#
+# saganineeleven is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License.
+#
+# saganineeleven is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with saganineeleven.  If not, see <https://www.gnu.org/licenses/>.
+"""
+Daemon renders documents by jobs. Interpreter, handlers and compiled templates are kept warm between jobs.
+Templates are held by registry, they are compiled again only if file is changed.
+
+Protocol is json lines. Job is an object with template path, destination path and context:
+{"template": "contract.docx", "destination": "contract-1.docx", "context": {"name": "Prince"}}
+Reply is an object with status and timings in seconds, or status and error:
+{"status": "ok", "timings": {"template": 0.0001, "render": 0.012, "total": 0.0121}}
+{"status": "error", "error": "FileNotFoundError: ..."}
+
+Jobs are read from lines of stream (stdin) or from connections of unix socket. Connection can send many jobs,
+each one gets reply in order. Paths are relative to working directory of daemon. Destination is written to temporary file
+and it is renamed after complete rendering.
+
+Daemon is started by command `saganineeleven serve`. Module is thin client also, it does not import cli and handlers:
+python -m saganineeleven.contrib.daemon --socket daemon.sock --template contract.docx --destination contract-1.docx --context '{}'
+"""
+import json
+import os
+import socket
+import stat
+import sys
+from argparse import ArgumentParser
+from dataclasses import dataclass
+from socketserver import StreamRequestHandler, ThreadingUnixStreamServer
+from time import perf_counter
+from typing import TYPE_CHECKING, Iterable, Iterator, TextIO
+from uuid import uuid4
+
+# Client does not need them. They are given to Daemon by command `serve`.
+if TYPE_CHECKING:
+	from saganineeleven.document import DocumentHandler, TemplateHandler
+	from saganineeleven.registry import Registry
+
+BUDGET = 256 * 1024 * 1024  # in bytes
+
+
+@dataclass
+class Daemon:
+	document_handler: 'DocumentHandler'
+	template_handler: 'TemplateHandler'
+	registry: 'Registry'
+
+	def handle(self, job: dict) -> dict:
+		start = perf_counter()
+		try:
+			template = self.registry.get(job['template'], self.document_handler, self.template_handler)
+			prepared = perf_counter()
+			destination = job['destination']
+			directory, name = os.path.split(os.path.abspath(destination))
+			# Temporary file is in the same directory for atomic rename. It gets permissions like destination would get.
+			temporary = os.path.join(directory, f'.{name}.{uuid4().hex}.part')
+			try:
+				with open(temporary, 'xb') as stream:
+					template.render(job.get('context', {}), stream)
+				os.replace(temporary, destination)
+			except BaseException:
+				if os.path.exists(temporary):
+					os.unlink(temporary)
+				raise
+		except Exception as error:
+			return {'status': 'error', 'error': f'{type(error).__name__}: {error}'}
+
+		stop = perf_counter()
+		return {'status': 'ok', 'timings': {'template': prepared - start, 'render': stop - prepared, 'total': stop - start}}
+
+	def handle_line(self, line: str) -> str:
+		try:
+			job = json.loads(line)
+		except ValueError as error:
+			reply = {'status': 'error', 'error': f'{type(error).__name__}: {error}'}
+		else:
+			reply = self.handle(job)
+		return json.dumps(reply) + '\n'
+
+	def serve_stream(self, source: TextIO, destination: TextIO):
+		"Serve jobs till the end of source. Empty lines are skipped."
+		for line in source:
+			if line.strip():
+				destination.write(self.handle_line(line))
+				destination.flush()
+
+	def make_server(self, path: str) -> ThreadingUnixStreamServer:
+		daemon = self
+
+		class Handler(StreamRequestHandler):
+			def handle(self):
+				for line in self.rfile:
+					if line.strip():
+						self.wfile.write(daemon.handle_line(line.decode('utf-8')).encode('utf-8'))
+
+		# Socket is left by previous daemon.
+		if os.path.exists(path) and stat.S_ISSOCK(os.stat(path).st_mode):
+			os.unlink(path)
+		return ThreadingUnixStreamServer(path, Handler)
+
+
+def request(path: str, jobs: Iterable[dict]) -> Iterator[dict]:
+	"Send jobs to daemon on unix socket and yield replies."
+	with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as connection:
+		connection.connect(path)
+		with connection.makefile('rwb') as stream:
+			for job in jobs:
+				stream.write(json.dumps(job).encode('utf-8') + b'\n')
+				stream.flush()
+				yield json.loads(stream.readline())
+
+
+def main(options):
+	job = {'template': os.path.abspath(options.template), 'destination': os.path.abspath(options.destination), 'context': json.loads(options.context)}
+	reply, = request(options.socket, (job,))
+	print(json.dumps(reply))
+	return reply['status'] != 'ok'
+
+
+parser = ArgumentParser(description='Send job to daemon. Exit code is not zero if job is failed.')
+parser.add_argument('--socket', required=True)
+parser.add_argument('--template', required=True)
+parser.add_argument('--destination', required=True)
+parser.add_argument('--context', default='{}')
+
+
+if __name__ == '__main__':
+	sys.exit(main(parser.parse_args()))
@@ -13,67 +13,64 @@
 #
 # You should have received a copy of the GNU General Public License
 # along with saganineeleven.  If not, see <https://www.gnu.org/licenses/>.
-from collections import deque
-from dataclasses import dataclass, field
+import re
+from functools import lru_cache
+from typing import Iterable, Mapping, Optional, Sequence, Tuple
 
 from django.template import Context
-from django.template.base import Template, tag_re
+from django.template.base import BLOCK_TAG_START, COMMENT_TAG_START, VARIABLE_TAG_START, Template, tag_re
 from django.template.engine import Engine
 
-from saganineeleven.straighten import Token, elementstr
+from saganineeleven.prescan import make_prescan
+from saganineeleven.straighten import BufferedLexer, Token
 
 
-@dataclass(init=True)
-class Lexer:
+# Position of possible start of terminal. Opener can be completed by next chunk, if buffer ends with its first character.
+opener_re = re.compile('|'.join(map(re.escape, (BLOCK_TAG_START, VARIABLE_TAG_START, COMMENT_TAG_START))) + r'|\{$')
+
+
+class Lexer(BufferedLexer):
 	"""
 	Lexer is for django 3.1. Each django version can change details of implementaion template system.
 	This module uses private API.
+
+	Django template lexer is based on regex. Our lexer should be 100% comptatible with django.
+	I don't find a incremental regex engine. A trick is run regex find first match over again on string to simulate incremental parsing.
+	"""
+	opener_re = opener_re
+
+	def find_terminals(self, text: str) -> Iterable[Tuple[Token, int, int]]:
+		return ((Token.terminal, *match.span()) for match in tag_re.finditer(text))
+
+
+prescan = make_prescan(BLOCK_TAG_START, VARIABLE_TAG_START, COMMENT_TAG_START)
+
+
+CACHE_SIZE = 64
+
+
+def make_engine(builtins: Optional[Sequence[str]] = None, libraries: Optional[Mapping[str, str]] = None) -> Engine:
+	return Engine(debug=False, loaders=(), builtins=builtins, libraries=libraries)
+
+
+engine = make_engine()
+
+
+def configure(builtins: Optional[Sequence[str]] = None, libraries: Optional[Mapping[str, str]] = None):
+	"""
+	Replace engine. Builtins and libraries are modules with template tags and filters, they are given to Engine.
+	Templates compiled by previous engine are forgotten.
 	"""
-	buffer: str = field(default=elementstr(), init=False)
-	is_closed: bool = field(default=False, init=False)
-	events: deque = field(default_factory=deque, init=False)
-
-	def feed(self, chunk):
-		"""
-		Django template lexer is based on regex. Our lexer should be 100% comptatible with django.
-		I don't find a incremental regex engine. A trick is run regex find first match over again on string to simulate incremental parsing.
-		"""
-		assert not self.is_closed
-		self.buffer += chunk
-		last_position = 0
-		# XXX: this implementation hold much data in memory. Develop some trick for skiping as much as posible text.
-		# Possible solution is checking for spicial cases. For example:
-		# - re.escape(BLOCK_TAG_START)
-		# - re.escape(VARIABLE_TAG_START)
-		# - re.escape(COMMENT_TAG_START)
-		# If nothing found then drain text to events.
-		for match in tag_re.finditer(self.buffer):
-			start, end = match.span()
-			text = self.buffer[last_position:start]
-			if text:
-				self.events.append((Token.text, text))
-			# self.buffer is special type. Ignore match and use it method for slicing.
-			self.events.append((Token.terminal, self.buffer[start:end]))
-			last_position = end
-
-		# perform cutting if there is a any match
-		if last_position:
-			self.buffer = self.buffer[last_position:]
-
-	def close(self):
-		self.is_closed = True
-
-	def read_events(self):
-		while self.events:
-			yield self.events.popleft()
-		if self.is_closed and self.buffer:
-			yield Token.text, self.buffer
-			self.buffer = None
-			self.events = None
+	global engine
+	engine = make_engine(builtins, libraries)
+	get_template.cache_clear()
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def get_template(template_string: str) -> Template:
+	"Compiled template does not keep state of rendering, it is rendered many times."
+	return Template(template_string, engine=engine)
 
 
 def render(template_string, context):
-	"Shortcut."
-	engine = Engine(debug=False, loaders=())
-	template = Template(template_string, engine=engine)
-	return template.render(Context(context, autoescape=False))
+	return get_template(template_string).render(Context(context, autoescape=False))
@@ -78,12 +78,15 @@ BIG SURPRISE! There is cat in bag. You can see AlternateContent on any place. It
 It is hard to present in template, because textual representation may be different. Also there are side effects with placing side by side match options together.
 """
 import re
+from copy import copy
 from dataclasses import dataclass
+from functools import partial
 from itertools import chain, count
 from typing import Iterable, Tuple
 from xml.etree.ElementTree import Element
 from zipfile import ZIP_DEFLATED, ZipExtFile, ZipFile
 
+from saganineeleven.archive import Member, write_raw
 from saganineeleven.straighten import Path
 
 CHUNK_SIZE = max(256 * 1024, ZipExtFile.MIN_READ_SIZE) # in bytes
@@ -95,6 +98,11 @@ def iter(source):
 		yield from map(file.open, file.infolist())
 
 
+def iter_members(source):
+	with ZipFile(source, 'r') as file:
+		yield from map(partial(Member, file), file.infolist())
+
+
 def create(path):
 	return ZipFile(path, 'w', compression=ZIP_DEFLATED)
 
@@ -279,8 +287,8 @@ class ElementTextProcessor:
 				# w_EG_RunInnerContent =
 				#   | element t { w_CT_Text }
 				# w_CT_Text = s_ST_String, xml_space?
-				# It is save to use copy method, because element `t` does not contain children and its one attribute is already cleared.
-				new = self.destination.copy()
+				# It is save to use copy, because element `t` does not contain children and its one attribute is already cleared.
+				new = copy(self.destination)
 				new.text = ''
 				self.destination_parent.append(new)
 				if self.destination.text.startswith(' ') or self.destination.text.endswith(' '):
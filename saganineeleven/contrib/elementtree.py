@@ -0,0 +1,189 @@
+# Copyright 2021 Stepan Bakshayev
+#
+# This file is part of saganineeleven.
+#
+# saganineeleven is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License.
+#
+# saganineeleven is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with saganineeleven.  If not, see <https://www.gnu.org/licenses/>.
+"""
+Xml backend on xml.etree.ElementTree from standard library. It is default backend.
+
+Backend makes tree from bytes or stream of xml part, makes root element for loaded tree and writes rendered tree.
+Other work with elements goes through common methods of Element: makeelement, append, indexing, attrib.
+
+Writer writes rendered tree incrementally, it is driven by StreamingTreeBuilder. Writer uses private API of
+xml.etree.ElementTree for serialization to be the same as write does.
+
+Origin tree is shrunk by freeze while it is parsed by iterstraighten. Subtree is kept as marshal of tuples,
+it is many times smaller than elements. Placeholder is made into elements again by thaw on copying.
+"""
+import marshal
+from functools import lru_cache
+from io import TextIOWrapper
+from operator import itemgetter
+from typing import BinaryIO, Iterator, Mapping, Optional, Tuple
+from weakref import WeakKeyDictionary
+from xml.etree.ElementTree import Element, ElementTree, _escape_attrib, _escape_cdata, _namespace_map, _namespaces, _serialize_xml
+from xml.etree.ElementTree import fromstring as xml_fromstring
+from xml.etree.ElementTree import iterparse as xml_iterparse
+
+DECLARATION = "<?xml version='1.0' encoding='utf-8'?>\n"
+
+
+def fromstring(data: bytes) -> Element:
+	return xml_fromstring(data)
+
+
+def iterparse(source: BinaryIO) -> Iterator[Tuple[str, Element]]:
+	return xml_iterparse(source, events=('start', 'end'))
+
+
+# Tag of placeholder is not namespace, it is never written. Copy of placeholder is thawed subtree.
+FROZEN = 'saganineeleven-frozen'
+
+
+def pack(element: Element) -> tuple:
+	return element.tag, element.attrib, element.text, element.tail, tuple(map(pack, element))
+
+
+def unpack(packed: tuple) -> Element:
+	tag, attrib, text, tail, children = packed
+	element = Element(tag, attrib)
+	element.text = text
+	element.tail = tail
+	element.extend(map(unpack, children))
+	return element
+
+
+# Placeholders of equal subtrees are shared, formatting of runs and paragraphs is repeated many times in document.
+@lru_cache(maxsize=1024)
+def load(data: bytes) -> tuple:
+	return marshal.loads(data)
+
+
+class FrozenElement(Element):
+	"Placeholder of complete subtree. Text is marshal of subtree."
+	__slots__ = ()
+
+	def thaw(self) -> Element:
+		return unpack(load(self.text))
+
+
+def freeze(element: Element, frozen: dict) -> Element:
+	"Make placeholder of subtree. Placeholders of equal subtrees are the same object from frozen."
+	data = marshal.dumps(pack(element))
+	placeholder = frozen.get(data)
+	if placeholder is None:
+		placeholder = frozen[data] = FrozenElement(FROZEN)
+		placeholder.text = data
+	return placeholder
+
+
+def iter_thawed(root: Element) -> Iterator[Element]:
+	"Iterate elements like Element.iter, placeholders are replaced by their subtrees."
+	for element in root.iter():
+		thaw = getattr(element, 'thaw', None)
+		if thaw is None:
+			yield element
+		else:
+			yield from thaw().iter()
+
+
+class ThawedTree:
+	"Tree for functions of ElementTree which iterate elements only."
+	def __init__(self, root: Element):
+		self.root = root
+
+	def iter(self) -> Iterator[Element]:
+		return iter_thawed(self.root)
+
+
+def make_element(tag: str, attrib: Mapping[str, str], nsmap: Optional[Mapping] = None) -> Element:
+	"ElementTree does not keep prefixes of namespaces. It makes ns0, ns1 and so on on writing."
+	return Element(tag, attrib)
+
+
+def write(root: Element, destination: BinaryIO):
+	# XXX: etree does not store original parameters of xml.
+	ElementTree(root).write(destination, encoding='utf-8', xml_declaration=True)
+
+
+class QualifiedNames(dict):
+	"Names of tags and attributes with prefixes. Names of new elements are made on demand."
+	def __init__(self, qnames: Mapping[str, str], namespaces: Mapping[str, str]):
+		super().__init__(qnames)
+		self.namespaces = namespaces
+
+	def __missing__(self, name: str) -> str:
+		if name[:1] == '{':
+			uri, local = name[1:].split('}', 1)
+			prefix = self.namespaces.get(uri) or _namespace_map.get(uri)
+			# Declarations are written with root, there is no way to declare namespace later.
+			if prefix is None:
+				raise RuntimeError(f'Namespace {uri} is not declared in original tree.', uri, name)
+			qualified = f'{prefix}:{local}'
+		else:
+			qualified = name
+		self[name] = qualified
+		return qualified
+
+
+# Rendered trees are made from elements of original tree. Namespaces of original tree are used for all renders.
+names_cache = WeakKeyDictionary()
+
+
+def get_names(origin_root: Element) -> Tuple[QualifiedNames, Mapping[str, str]]:
+	names = names_cache.get(origin_root)
+	if names is None:
+		qnames, namespaces = _namespaces(ThawedTree(origin_root))
+		names = names_cache[origin_root] = QualifiedNames(qnames, namespaces), namespaces
+	return names
+
+
+class Writer:
+	"""
+	Writer of elements for StreamingTreeBuilder. Element is written with start and end or as whole.
+	Namespaces are taken from original tree and they are declared in first written element.
+	Destination is not closed, writer only flushes buffer to it.
+	"""
+	def __init__(self, origin_root: Element, destination: BinaryIO):
+		self.qnames, self.namespaces = get_names(origin_root)
+		self.stream = TextIOWrapper(destination, encoding='utf-8', errors='xmlcharrefreplace', newline='\n')
+		self.write = self.stream.write
+		self.write(DECLARATION)
+
+	def take_namespaces(self) -> Optional[Mapping[str, str]]:
+		namespaces, self.namespaces = self.namespaces, None
+		return namespaces
+
+	def start(self, element: Element):
+		write = self.write
+		write(f'<{self.qnames[element.tag]}')
+		namespaces = self.take_namespaces()
+		if namespaces:
+			for uri, prefix in sorted(namespaces.items(), key=itemgetter(1)):
+				write(f' xmlns:{prefix}="{_escape_attrib(uri)}"')
+		for name, value in element.items():
+			write(f' {self.qnames[name]}="{_escape_attrib(value)}"')
+		write('>')
+		if element.text:
+			write(_escape_cdata(element.text))
+
+	def end(self, element: Element):
+		self.write(f'</{self.qnames[element.tag]}>')
+		if element.tail:
+			self.write(_escape_cdata(element.tail))
+
+	def element(self, element: Element):
+		_serialize_xml(self.write, element, self.qnames, self.take_namespaces(), short_empty_elements=True)
+
+	def close(self):
+		self.stream.detach()
@@ -0,0 +1,157 @@
+# Copyright 2021 Stepan Bakshayev
+#
+# This file is part of saganineeleven.
+#
+# saganineeleven is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License.
+#
+# saganineeleven is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with saganineeleven.  If not, see <https://www.gnu.org/licenses/>.
+"""
+Template handler for jinja2 3. Jinja compiles template to python code, it is much faster than django on loops.
+
+Lexer reproduces tokenization of jinja with default environment: terminals are blocks, variables and comments.
+Strings and brackets are respected inside of terminal like jinja does, `{{ {'a': '}}'} }}` is one terminal.
+Raw block is one pending piece till its end, content of raw block is text.
+Modifiers of whitespace control `-` and `+` have no effect. Stringify puts marker of element before each text
+and each terminal, jinja sees marker next to terminal instead of whitespace.
+
+Compiled templates are cached in memory. Template has name of source hash, it is a key for bytecode cache also.
+Bytecode cache is optional, it is given by configure. For example, FileSystemBytecodeCache keeps code on disk.
+"""
+import re
+from functools import lru_cache
+from hashlib import blake2b
+from typing import Iterable, List, Optional, Tuple
+
+from jinja2 import BytecodeCache, Environment, Template
+from jinja2.lexer import string_re
+
+from saganineeleven.prescan import make_prescan
+from saganineeleven.straighten import BufferedLexer, Token
+
+BLOCK_START = '{%'
+VARIABLE_START = '{{'
+COMMENT_START = '{#'
+CLOSERS = {BLOCK_START: '%}', VARIABLE_START: '}}', COMMENT_START: '#}'}
+CACHE_SIZE = 64
+
+start_re = re.compile('|'.join(map(re.escape, CLOSERS)))
+# Position of possible start of terminal. Opener can be completed by next chunk, if buffer ends with its first character.
+opener_re = re.compile(f'{start_re.pattern}|\\{{$')
+raw_begin_re = re.compile(r'\{%[-+]?\s*raw\s*-?%\}')
+raw_end_re = re.compile(r'\{%[-+]?\s*endraw\s*[-+]?%\}')
+# Order is matter. Closer is checked before closing bracket, `}}` is closer on top level only.
+expression_re = {
+	opener: re.compile(f'(?P<string>{string_re.pattern})|(?P<open>[(\\[{{])|(?P<closer>-?{re.escape(closer)})|(?P<close>[)\\]}}])', re.DOTALL)
+	for opener, closer in CLOSERS.items() if opener != COMMENT_START
+}
+
+
+def find_end(text: str, opener: str, position: int) -> Optional[int]:
+	"Return end of terminal started by opener or None if terminal is not complete."
+	if opener == COMMENT_START:
+		end = text.find(CLOSERS[opener], position)
+		return None if end == -1 else end + len(CLOSERS[opener])
+
+	depth = 0
+	pattern = expression_re[opener]
+	while True:
+		match = pattern.search(text, position)
+		if match is None:
+			return None
+		kind = match.lastgroup
+		position = match.end()
+		if kind == 'open':
+			depth += 1
+		elif kind == 'close':
+			depth = max(depth - 1, 0)
+		elif kind == 'closer':
+			if not depth:
+				return position
+			# Closer inside of brackets is operator and bracket. Check characters one by one.
+			position = match.start() + 1
+			if match.group() == '}}':
+				depth -= 1
+
+
+def find_terminals(text: str) -> Tuple[List[Tuple[Token, int, int]], int]:
+	"Return spans of complete terminals and position of incomplete rest. Content of raw block is text span."
+	spans = []
+	position = 0
+	while True:
+		match = start_re.search(text, position)
+		if match is None:
+			return spans, len(text)
+		start = match.start()
+		raw_begin = raw_begin_re.match(text, start)
+		if raw_begin is not None:
+			raw_end = raw_end_re.search(text, raw_begin.end())
+			if raw_end is None:
+				return spans, start
+			spans.append((Token.terminal, start, raw_begin.end()))
+			spans.append((Token.text, raw_begin.end(), raw_end.start()))
+			spans.append((Token.terminal, raw_end.start(), raw_end.end()))
+			position = raw_end.end()
+			continue
+
+		end = find_end(text, match.group(), match.end())
+		if end is None:
+			return spans, start
+		spans.append((Token.terminal, start, end))
+		position = end
+
+
+class Lexer(BufferedLexer):
+	"Jinja lexer is not incremental. Terminals are found by find_terminals over buffer again."
+	opener_re = opener_re
+
+	def find_terminals(self, text: str) -> Iterable[Tuple[Token, int, int]]:
+		spans, _ = find_terminals(text)
+		return spans
+
+
+prescan = make_prescan(BLOCK_START, VARIABLE_START, COMMENT_START)
+
+
+def make_environment(bytecode_cache: Optional[BytecodeCache] = None) -> Environment:
+	# Trailing newline is text of document.
+	return Environment(autoescape=False, keep_trailing_newline=True, bytecode_cache=bytecode_cache)
+
+
+environment = make_environment()
+
+
+def configure(bytecode_cache: Optional[BytecodeCache] = None):
+	"Replace environment. Templates compiled by previous environment are forgotten."
+	global environment
+	environment = make_environment(bytecode_cache)
+	get_template.cache_clear()
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def get_template(template_string: str) -> Template:
+	"It mimics BaseLoader.load. Source is known already, there is no loader."
+	name = blake2b(template_string.encode('utf-8', 'surrogatepass'), digest_size=16).hexdigest()
+	bytecode_cache = environment.bytecode_cache
+	code = None
+	if bytecode_cache is not None:
+		# Markers of elements are lone surrogates, jinja can not encode them for checksum. Name is checksum already.
+		bucket = bytecode_cache.get_bucket(environment, name, None, name)
+		code = bucket.code
+	if code is None:
+		code = environment.compile(template_string, name)
+		if bytecode_cache is not None:
+			bucket.code = code
+			bytecode_cache.set_bucket(bucket)
+	return environment.template_class.from_code(environment, code, environment.make_globals(None))
+
+
+def render(template_string, context):
+	return get_template(template_string).render(context)
@@ -0,0 +1,57 @@
+# Copyright 2021 Stepan Bakshayev
+#
+# This file is part of saganineeleven.
+#
+# saganineeleven is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License.
+#
+# saganineeleven is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with saganineeleven.  If not, see <https://www.gnu.org/licenses/>.
+"""
+Xml backend on lxml. It is faster in parsing and writing and it keeps prefixes of namespaces.
+
+Parser drops comments and processing instructions like ElementTree does.
+Elements of lxml are not pickled. Trees go to process executor and back as bytes of tostring,
+see document.prepare and document.render_part.
+"""
+from typing import BinaryIO, Iterator, Mapping, Optional, Tuple
+
+from lxml.etree import Element, ElementTree, XMLParser, _Element
+from lxml.etree import fromstring as lxml_fromstring
+from lxml.etree import iterparse as lxml_iterparse
+from lxml.etree import tostring as lxml_tostring
+
+
+def fromstring(data: bytes) -> _Element:
+	# Parser is not shared, it is not safe to use one parser from many threads.
+	parser = XMLParser(remove_comments=True, remove_pis=True, huge_tree=True)
+	return lxml_fromstring(data, parser)
+
+
+def iterparse(source: BinaryIO) -> Iterator[Tuple[str, _Element]]:
+	return lxml_iterparse(source, events=('start', 'end'), remove_comments=True, remove_pis=True, huge_tree=True)
+
+
+def make_element(tag: str, attrib: Mapping[str, str], nsmap: Optional[Mapping] = None) -> _Element:
+	return Element(tag, attrib, nsmap)
+
+
+# Declaration is the same as ElementTree writes.
+DECLARATION = b"<?xml version='1.0' encoding='utf-8'?>\n"
+
+
+def write(root: _Element, destination: BinaryIO):
+	destination.write(DECLARATION)
+	# Root made by makeelement belongs to document of origin tree, getroottree would return origin tree.
+	ElementTree(root).write(destination, encoding='utf-8', xml_declaration=False)
+
+
+def tostring(root: _Element) -> bytes:
+	"Serialize tree for fromstring. Tail of root is not part of tree."
+	return lxml_tostring(root, with_tail=False)
@@ -13,10 +13,12 @@
 #
 # You should have received a copy of the GNU General Public License
 # along with saganineeleven.  If not, see <https://www.gnu.org/licenses/>.
+from functools import partial
 from typing import Iterable, Tuple
 from xml.etree.ElementTree import Element
 from zipfile import ZIP_DEFLATED, ZipExtFile, ZipFile
 
+from saganineeleven.archive import Member, write_raw
 from saganineeleven.straighten import Path
 
 CHUNK_SIZE = max(256 * 1024, ZipExtFile.MIN_READ_SIZE) # in bytes
@@ -29,6 +31,12 @@ def iter(source):
 		yield from map(file.open, filter(lambda i: i.filename.endswith('.xml'), file.infolist()))
 
 
+def iter_members(source):
+	with ZipFile(source, 'r') as file:
+		# XXX: this is wrong to filter out xml.
+		yield from map(partial(Member, file), filter(lambda i: i.filename.endswith('.xml'), file.infolist()))
+
+
 def create(path):
 	return ZipFile(path, 'w', compression=ZIP_DEFLATED)
 
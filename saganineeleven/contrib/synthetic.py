@@ -0,0 +1,248 @@
+# Copyright 2021 Stepan Bakshayev
+#
+# This file is part of saganineeleven.
+#
+# saganineeleven is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License.
+#
+# saganineeleven is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with saganineeleven.  If not, see <https://www.gnu.org/licenses/>.
+"""
+Synthetic templates of given shape for performance and memory tests. Fixtures are tiny and makefixture requires
+LibreOffice, generator writes valid docx and odt with pure python. Output is deterministic for the same shape.
+
+Template language is common subset of django and jinja2. Terminals are substitution of variable `name`,
+cycle over `items` with substitution of `item` and condition on `flag`. Cycles and conditions enclose
+whole paragraphs or whole rows of table. Context for rendering is made by make_context.
+"""
+import random
+import sys
+from argparse import ArgumentParser
+from dataclasses import dataclass, fields
+from itertools import count
+from pathlib import Path
+from typing import BinaryIO, Iterator, List, Sequence, Tuple, Union
+from zipfile import ZIP_DEFLATED, ZIP_STORED, ZipFile
+
+VARIABLE = '{{ name }}'
+ITEM = '{{ item }}'
+LOOP = '{% for item in items %}', '{% endfor %}'
+CONDITION = '{% if flag %}', '{% endif %}'
+# Terminal is splitted across two runs.
+SPLITTED = VARIABLE[:5], VARIABLE[5:]
+
+
+@dataclass(frozen=True)
+class Shape:
+	"""
+	Sizes are counts of elements. Densities are probabilities from 0 to 1:
+	- variables: run is substitution of variable instead of plain text
+	- split: substitution is splitted across two runs
+	- loops and conditions: paragraph or row is enclosed by cycle or condition.
+	Depth is count of tables with one cell around the whole body.
+	"""
+	paragraphs: int = 100
+	runs: int = 3
+	depth: int = 0
+	rows: int = 0
+	cells: int = 3
+	variables: float = 0.5
+	split: float = 0.
+	loops: float = 0.
+	conditions: float = 0.
+	items: int = 3
+	seed: int = 0
+
+
+@dataclass(frozen=True)
+class Markup:
+	"Format strings of format. Table gets name, count of columns and rows."
+	document: str
+	paragraph: str
+	run: str
+	table: str
+	column: str
+	row: str
+	cell: str
+	content_name: str
+	members: Tuple[Tuple[str, bytes, int], ...]
+
+
+W = 'http://schemas.openxmlformats.org/wordprocessingml/2006/main'
+
+DOCX = Markup(
+	document=f'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n<w:document xmlns:w="{W}"><w:body>{{}}</w:body></w:document>',
+	paragraph='<w:p>{}</w:p>',
+	run='<w:r><w:t xml:space="preserve">{}</w:t></w:r>',
+	table='<w:tbl><w:tblPr><w:tblW w:w="0" w:type="auto"/></w:tblPr><w:tblGrid>{columns}</w:tblGrid>{rows}</w:tbl>',
+	column='<w:gridCol/>',
+	row='<w:tr>{}</w:tr>',
+	cell='<w:tc>{}</w:tc>',
+	content_name='word/document.xml',
+	members=(
+		('[Content_Types].xml', (
+			b'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+			b'<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+			b'<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+			b'<Default Extension="xml" ContentType="application/xml"/>'
+			b'<Override PartName="/word/document.xml" ContentType="application/vnd.openxmlformats-officedocument.wordprocessingml.document.main+xml"/>'
+			b'</Types>'
+		), ZIP_DEFLATED),
+		('_rels/.rels', (
+			b'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+			b'<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+			b'<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" Target="word/document.xml"/>'
+			b'</Relationships>'
+		), ZIP_DEFLATED),
+	),
+)
+
+ODT_MIMETYPE = b'application/vnd.oasis.opendocument.text'
+
+ODT = Markup(
+	document=(
+		'<?xml version="1.0" encoding="UTF-8"?>\n'
+		'<office:document-content xmlns:office="urn:oasis:names:tc:opendocument:xmlns:office:1.0"'
+		' xmlns:text="urn:oasis:names:tc:opendocument:xmlns:text:1.0"'
+		' xmlns:table="urn:oasis:names:tc:opendocument:xmlns:table:1.0"'
+		' office:version="1.2"><office:body><office:text>{}</office:text></office:body></office:document-content>'
+	),
+	paragraph='<text:p>{}</text:p>',
+	run='<text:span>{}</text:span>',
+	table='<table:table table:name="Table{name}"><table:table-column table:number-columns-repeated="{count}"/>{rows}</table:table>',
+	column='',
+	row='<table:table-row>{}</table:table-row>',
+	cell='<table:table-cell office:value-type="string">{}</table:table-cell>',
+	content_name='content.xml',
+	members=(
+		# Mimetype is the first member and it is not compressed by specification.
+		('mimetype', ODT_MIMETYPE, ZIP_STORED),
+		('META-INF/manifest.xml', (
+			b'<?xml version="1.0" encoding="UTF-8"?>\n'
+			b'<manifest:manifest xmlns:manifest="urn:oasis:names:tc:opendocument:xmlns:manifest:1.0" manifest:version="1.2">'
+			b'<manifest:file-entry manifest:full-path="/" manifest:version="1.2" manifest:media-type="' + ODT_MIMETYPE + b'"/>'
+			b'<manifest:file-entry manifest:full-path="content.xml" manifest:media-type="text/xml"/>'
+			b'</manifest:manifest>'
+		), ZIP_DEFLATED),
+	),
+)
+
+FORMATS = {
+	'docx': DOCX,
+	'odt': ODT,
+}
+
+
+class Generator:
+	"Generator keeps state between blocks: random numbers and names of tables."
+
+	def __init__(self, shape: Shape, markup: Markup):
+		self.shape = shape
+		self.markup = markup
+		self.random = random.Random(shape.seed)
+		self.names = count(1)
+
+	def enclosures(self) -> List[Tuple[str, str]]:
+		"Choose terminals around block. Cycle is outside of condition."
+		enclosures = []
+		if self.random.random() < self.shape.loops:
+			enclosures.append(LOOP)
+		if self.random.random() < self.shape.conditions:
+			enclosures.append(CONDITION)
+		return enclosures
+
+	def paragraph(self, texts: Sequence[str]) -> str:
+		return self.markup.paragraph.format(''.join(map(self.markup.run.format, texts)))
+
+	def texts(self, label: str) -> List[str]:
+		texts = []
+		for index in range(self.shape.runs):
+			if self.random.random() < self.shape.variables:
+				if self.random.random() < self.shape.split:
+					texts.extend(SPLITTED)
+				else:
+					texts.append(VARIABLE)
+			else:
+				texts.append(f'{label}.{index} ')
+		return texts
+
+	def table(self, rows: Sequence[str], columns: int) -> str:
+		return self.markup.table.format(name=next(self.names), count=columns, columns=self.markup.column*columns, rows=''.join(rows))
+
+	def row(self, cells: Sequence[str]) -> str:
+		return self.markup.row.format(''.join(map(self.markup.cell.format, cells)))
+
+	def iter_paragraphs(self) -> Iterator[str]:
+		for number in range(self.shape.paragraphs):
+			enclosures = self.enclosures()
+			texts = self.texts(f'Paragraph {number}')
+			if LOOP in enclosures:
+				texts.append(ITEM)
+			for opener, _ in enclosures:
+				yield self.paragraph((opener,))
+			yield self.paragraph(texts)
+			for _, closer in reversed(enclosures):
+				yield self.paragraph((closer,))
+
+	def iter_rows(self) -> Iterator[str]:
+		# Terminal of cycle or condition is in the first cell, the rest cells are empty.
+		empty = (self.paragraph(()),) * (self.shape.cells - 1)
+		for number in range(self.shape.rows):
+			enclosures = self.enclosures()
+			cells = [self.texts(f'Cell {number}.{index}') for index in range(self.shape.cells)]
+			if LOOP in enclosures:
+				cells[0].append(ITEM)
+			for opener, _ in enclosures:
+				yield self.row((self.paragraph((opener,)),) + empty)
+			yield self.row(tuple(map(self.paragraph, cells)))
+			for _, closer in reversed(enclosures):
+				yield self.row((self.paragraph((closer,)),) + empty)
+
+	def body(self) -> str:
+		body = ''.join(self.iter_paragraphs())
+		if self.shape.rows:
+			body += self.table(tuple(self.iter_rows()), self.shape.cells)
+		for _ in range(self.shape.depth):
+			# Cell must end with paragraph.
+			body = self.table((self.row((body + self.paragraph(()),)),), 1)
+		return body
+
+
+def make_content(shape: Shape, markup: Markup = DOCX) -> bytes:
+	"Make xml of document content."
+	return markup.document.format(Generator(shape, markup).body()).encode()
+
+
+def make_context(shape: Shape) -> dict:
+	return {'name': 'Prince', 'items': [f'item {i}' for i in range(shape.items)], 'flag': True}
+
+
+def write(shape: Shape, destination: Union[str, Path, BinaryIO], markup: Markup = DOCX):
+	"Write archive of document to path or file object."
+	with ZipFile(destination, 'w') as archive:
+		for name, data, compression in markup.members:
+			archive.writestr(name, data, compression)
+		archive.writestr(markup.content_name, make_content(shape, markup), ZIP_DEFLATED)
+
+
+def main(options):
+	markup = FORMATS[options.format or options.destination.suffix.lstrip('.')]
+	shape = Shape(**{f.name: getattr(options, f.name) for f in fields(Shape)})
+	write(shape, options.destination, markup)
+
+
+parser = ArgumentParser(description='Write synthetic template of given shape. Format is guessed by suffix of destination.')
+parser.add_argument('destination', type=Path)
+parser.add_argument('--format', choices=sorted(FORMATS))
+for field in fields(Shape):
+	parser.add_argument(f'--{field.name}', type=field.type, default=field.default)
+
+
+if __name__ == '__main__':
+	sys.exit(main(parser.parse_args()))
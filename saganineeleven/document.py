@@ -0,0 +1,333 @@
+# Copyright 2021 Stepan Bakshayev
+#
+# This file is part of saganineeleven.
+#
+# saganineeleven is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License.
+#
+# saganineeleven is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with saganineeleven.  If not, see <https://www.gnu.org/licenses/>.
+from dataclasses import dataclass, field, replace
+from hashlib import blake2b
+from io import BytesIO
+from typing import TYPE_CHECKING, BinaryIO, Mapping, Callable, Optional, Tuple
+from xml.etree.ElementTree import Element
+
+from typing_extensions import Protocol
+
+from .straighten import ContentType, Index, Line, iterstraighten, LexerProtocol
+from .executor import Boundary, StreamingTreeBuilder, delineate_boundaries, enforce
+
+from .stringify import Table, stringify, parse
+from .contrib import elementtree
+
+# Modules for annotations only. They are not imported on start, concurrent.futures is heavy.
+if TYPE_CHECKING:
+	from concurrent.futures import Executor
+	from zipfile import ZipInfo
+
+	from .trace import Tracer
+
+
+class DocumentHandler(Protocol):
+	text_nodes: Mapping
+	convert: Callable
+	processor_factory: Callable
+	open: Callable
+	iter: Callable
+	iter_members: Callable
+	write_raw: Callable
+	create: Callable
+
+
+class XmlBackend(Protocol):
+	fromstring: Callable
+	iterparse: Callable
+	make_element: Callable
+	write: Callable
+	# Optional. Writer of elements for StreamingTreeBuilder. Complete tree is made and written otherwise.
+	Writer: Callable
+	# Optional. Placeholder of complete subtree for iterstraighten, it keeps memory of origin tree low.
+	freeze: Callable
+	# Optional. Serialization of tree for fromstring. Trees are passed to process executor as bytes if it is given,
+	# they are pickled otherwise.
+	tostring: Callable
+
+
+class TemplateHandler(Protocol):
+	Lexer: LexerProtocol
+	render: Callable
+	# Optional. Answer whether raw xml may contain template. False means plaintext definitely.
+	prescan: Callable
+
+
+@dataclass(frozen=True)
+class Part:
+	"""
+	Part is a member of document archive prepared for rendering.
+	Plaintext part is written as is from data. Data is compressed content of member with its original info.
+	Template part keeps everything does not depend on context.
+	Digest is hash of compressed content of part. It allows to reuse part if content is not changed.
+	"""
+	name: str
+	digest: bytes
+	data: bytes
+	content_type: ContentType
+	info: Optional['ZipInfo'] = None
+	root: Optional[Element] = None
+	line: Line = ()
+	boundaries: Mapping[Index, Boundary] = field(default_factory=dict)
+	template: str = ''
+	table: Table = ()
+
+
+def make_digest(data: bytes) -> bytes:
+	return blake2b(data, digest_size=16).digest()
+
+
+def prepare(
+	data: bytes,
+	Lexer: LexerProtocol,
+	text_nodes: Mapping,
+	convert: Callable,
+	iterparse: Callable = elementtree.iterparse,
+	freeze: Optional[Callable] = elementtree.freeze,
+	tracer: Optional['Tracer'] = None,
+	name: Optional[str] = None,
+	tostring: Optional[Callable] = None,
+) -> Optional[tuple]:
+	"""
+	Prepare xml content for rendering. Nothing is returned for plaintext.
+	Function does not depend on handlers, it is suitable for executor.
+	Stages are traced with name of part if tracer is given.
+	Root is returned serialized by tostring if it is given, see make_part.
+	"""
+	if tracer is not None:
+		tracer.start('iterstraighten', name)
+	origin_root, content, line = iterstraighten(BytesIO(data), Lexer, text_nodes, convert, iterparse, freeze)
+	if tracer is not None:
+		tracer.end('iterstraighten', name, size=len(data), line=len(line))
+	if content is not content.template:
+		return None
+
+	if tracer is not None:
+		tracer.start('delineate_boundaries', name)
+	boundaries = delineate_boundaries(origin_root, line)
+	if tracer is not None:
+		tracer.end('delineate_boundaries', name, boundaries=len(boundaries))
+		tracer.start('stringify', name)
+	template, table = stringify(line)
+	if tracer is not None:
+		tracer.end('stringify', name, template=len(template))
+	if tostring is not None:
+		origin_root = tostring(origin_root)
+	return origin_root, line, boundaries, template, table
+
+
+def make_part(plaintext: Part, prepared: Optional[tuple], fromstring: Optional[Callable] = None) -> Part:
+	"Root of prepared is parsed by fromstring if it is given."
+	if prepared is None:
+		return plaintext
+
+	root, line, boundaries, template, table = prepared
+	if fromstring is not None:
+		root = fromstring(root)
+	# Original content is not required for rendering of template part.
+	return Part(plaintext.name, plaintext.digest, b'', ContentType.template, None, root, line, boundaries, template, table)
+
+
+def write_part(
+	part: Part,
+	render_template: Callable,
+	processor_factory: Callable,
+	context: dict,
+	destination: BinaryIO,
+	write: Callable = elementtree.write,
+	Writer: Optional[Callable] = elementtree.Writer,
+	tracer: Optional['Tracer'] = None,
+):
+	"""
+	Elements are written to destination as soon as they are complete if Writer is given.
+	Tape is parsed lazily, stage enforce contains parsing and writing of elements in streaming.
+	"""
+	if tracer is not None:
+		tracer.start('template_render', part.name)
+	rendered = render_template(part.template, context)
+	if tracer is not None:
+		tracer.end('template_render', part.name, rendered=len(rendered))
+		tracer.start('enforce', part.name)
+	tape = parse(rendered, part.table)
+	if Writer is None:
+		builder = enforce(part.root, tape, part.boundaries, processor_factory)
+		if tracer is not None:
+			tracer.end('enforce', part.name)
+			tracer.start('serialization', part.name)
+		write(builder.destination, destination)
+		if tracer is not None:
+			tracer.end('serialization', part.name)
+	else:
+		enforce(part.root, tape, part.boundaries, processor_factory, StreamingTreeBuilder(part.root, Writer(part.root, destination)))
+		if tracer is not None:
+			tracer.end('enforce', part.name)
+
+
+def render_part(
+	part: Part,
+	render_template: Callable,
+	processor_factory: Callable,
+	context: dict,
+	write: Callable = elementtree.write,
+	Writer: Optional[Callable] = elementtree.Writer,
+	fromstring: Optional[Callable] = None,
+) -> bytes:
+	"""
+	Variant of write_part for executor.
+	Root of part is serialized xml if fromstring is given, trees of some backends are not pickled.
+	"""
+	if fromstring is not None:
+		part = replace(part, root=fromstring(part.root))
+	stream = BytesIO()
+	write_part(part, render_template, processor_factory, context, stream, write, Writer)
+	return stream.getvalue()
+
+
+@dataclass(frozen=True)
+class CompiledTemplate:
+	"""
+	CompiledTemplate is a result of work is done once per template. The render does only work depended of context:
+	template engine, parsing of tape and enforcing of tree.
+	"""
+	document_handler: DocumentHandler
+	template_handler: TemplateHandler
+	parts: Tuple[Part, ...]
+	backend: XmlBackend = elementtree
+
+	def render(self, context: dict, destination: BinaryIO, executor: Optional['Executor'] = None, tracer: Optional['Tracer'] = None):
+		"""
+		Template parts are rendered concurrently by executor if it is given.
+		Archive is written in original order of parts anyway.
+		Stages are reported to tracer if it is given, see saganineeleven.trace.
+		"""
+		if tracer is not None:
+			tracer.start('render')
+		render_template = self.template_handler.render
+		processor_factory = self.document_handler.processor_factory
+		write = self.backend.write
+		Writer = getattr(self.backend, 'Writer', None)
+		outputs = {}
+		if executor is not None:
+			tostring = getattr(self.backend, 'tostring', None)
+			fromstring = None if tostring is None else self.backend.fromstring
+			for index, part in enumerate(self.parts):
+				if part.content_type is ContentType.template:
+					if tostring is not None:
+						part = replace(part, root=tostring(part.root))
+					outputs[index] = executor.submit(render_part, part, render_template, processor_factory, context, write, Writer, fromstring)
+
+		with self.document_handler.create(destination) as archive:
+			for index, part in enumerate(self.parts):
+				if tracer is not None:
+					tracer.start('zip_write', part.name)
+				if part.content_type is not ContentType.template:
+					self.document_handler.write_raw(archive, part.info, part.data)
+				else:
+					with self.document_handler.open(archive, part.name) as destination_file:
+						if executor is None:
+							write_part(part, render_template, processor_factory, context, destination_file, write, Writer, tracer)
+						else:
+							destination_file.write(outputs[index].result())
+				if tracer is not None:
+					info = archive.getinfo(part.name)
+					tracer.end('zip_write', part.name, size=info.file_size, compress_size=info.compress_size)
+
+		if tracer is not None:
+			tracer.end('render')
+
+
+def compile(
+	source: BinaryIO,
+	document_handler: DocumentHandler,
+	template_handler: TemplateHandler,
+	previous: Optional[CompiledTemplate] = None,
+	executor: Optional['Executor'] = None,
+	backend: XmlBackend = elementtree,
+	tracer: Optional['Tracer'] = None,
+) -> CompiledTemplate:
+	"""
+	Parts of previous compiled template are reused if their content is not changed.
+	Xml parts are prepared concurrently by executor if it is given.
+	Xml parts without template are recognized by prescan of template handler and are not parsed.
+	Backend parses xml parts and writes rendered parts, it is elementtree or lxml from contrib.
+	Stages are reported to tracer if it is given, see saganineeleven.trace.
+	"""
+	if tracer is not None:
+		tracer.start('compile')
+	prescan = getattr(template_handler, 'prescan', None)
+	tostring = getattr(backend, 'tostring', None)
+	known = {}
+	# Parts depend on handlers: lexer makes template, text nodes make line. Trees of different backends are not mixed.
+	if previous is not None and (previous.document_handler, previous.template_handler, previous.backend) == (document_handler, template_handler, backend):
+		known = {(part.name, part.digest): part for part in previous.parts}
+
+	parts = []
+	for member in document_handler.iter_members(source):
+		if tracer is not None:
+			tracer.start('zip_read', member.name)
+		payload = member.read_raw()
+		digest = make_digest(payload)
+		part = known.get((member.name, digest))
+		data = None
+		if part is None:
+			part = Part(member.name, digest, payload, ContentType.plaintext, member.info)
+			data = member.read() if member.name.endswith('.xml') else None
+		if tracer is not None:
+			tracer.end('zip_read', member.name, size=member.info.file_size, compress_size=len(payload))
+
+		if data is not None:
+			if tracer is not None:
+				tracer.start('prescan', member.name)
+			template = prescan is None or prescan(data)
+			if tracer is not None:
+				tracer.end('prescan', member.name)
+			if template:
+				arguments = (
+					data, template_handler.Lexer, document_handler.text_nodes, document_handler.convert, backend.iterparse,
+					getattr(backend, 'freeze', None),
+				)
+				if executor is None:
+					part = make_part(part, prepare(*arguments, tracer, member.name))
+				else:
+					part = part, executor.submit(prepare, *arguments, tostring=tostring)
+		parts.append(part)
+
+	if executor is not None:
+		fromstring = None if tostring is None else backend.fromstring
+		parts = [make_part(p[0], p[1].result(), fromstring) if isinstance(p, tuple) else p for p in parts]
+
+	if tracer is not None:
+		tracer.end('compile')
+	return CompiledTemplate(document_handler, template_handler, tuple(parts), backend)
+
+
+def render(
+	source: BinaryIO,
+	destination: BinaryIO,
+	document_handler: DocumentHandler,
+	template_handler: TemplateHandler,
+	context: dict,
+	executor: Optional['Executor'] = None,
+	backend: XmlBackend = elementtree,
+	tracer: Optional['Tracer'] = None,
+):
+	"""
+	Executor is used for preparing and rendering of parts.
+	Process pool requires functions and classes of handlers to be importable by workers.
+	Tracer gets start and end of each stage, see saganineeleven.trace.
+	"""
+	compile(source, document_handler, template_handler, executor=executor, backend=backend, tracer=tracer).render(context, destination, executor, tracer)
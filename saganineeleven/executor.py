@@ -13,11 +13,14 @@
 #
 # You should have received a copy of the GNU General Public License
 # along with saganineeleven.  If not, see <https://www.gnu.org/licenses/>.
+from copy import deepcopy
 from dataclasses import dataclass, field, replace
 from operator import attrgetter, itemgetter
 from typing import Callable, Iterator, List, Mapping, Optional, Sequence, Tuple
 from xml.etree.ElementTree import Element
 
+from typing_extensions import Protocol
+
 from .straighten import Index, Line, Path, ElementPointer
 
 
@@ -30,15 +33,43 @@ def get_root(a: Sequence, b: Sequence) -> Sequence:
 	return a[:index+1]
 
 
+def declared_namespaces(element: Element) -> Optional[dict]:
+	"""
+	Prefixes of namespaces declared by element itself if tree has them (lxml). ElementTree does not have them.
+	Declarations of root and declarations below root (DrawingML inside w:drawing, for example) are kept.
+	lxml drops declaration on append if ancestor declares the same uri, prefix of ancestor is used then.
+	"""
+	nsmap = getattr(element, 'nsmap', None)
+	if not nsmap:
+		return None
+	parent = element.getparent()
+	if parent is None:
+		return nsmap
+	inherited = parent.nsmap
+	if nsmap == inherited:
+		return None
+	return {prefix: uri for prefix, uri in nsmap.items() if inherited.get(prefix) != uri} or None
+
+
 # XXX: copy-paste from Element.copy partially.
-def element_selfcopy(element: Element) -> Element:
-	new = element.makeelement(element.tag, element.attrib)
+def element_selfcopy(element: Element, nsmap: Optional[dict] = None) -> Element:
+	if nsmap is None:
+		new = element.makeelement(element.tag, element.attrib)
+	else:
+		new = element.makeelement(element.tag, element.attrib, nsmap)
 	new.text = element.text
 	new.tail = element.tail
 	return new
 
 
 def element_deepcopy(element: Element):
+	# Frozen placeholder of origin tree makes new subtree, see contrib.elementtree.freeze.
+	thaw = getattr(element, 'thaw', None)
+	if thaw is not None:
+		return thaw()
+	# Tree of lxml copies subtree with its declarations of namespaces by itself.
+	if hasattr(element, 'nsmap'):
+		return deepcopy(element)
 	new = element_selfcopy(element)
 	for child in element:
 		new.append(element_deepcopy(child))
@@ -63,7 +94,7 @@ class TreeBuilder:
 	def __post_init__(self):
 		self.source_chain.append(self.source)
 
-		self.destination = element_selfcopy(self.source)
+		self.destination = element_selfcopy(self.source, declared_namespaces(self.source))
 		self.destination_chain.append(self.destination)
 
 	def copy(self, routes: Iterator[Route]):
@@ -71,8 +102,7 @@ class TreeBuilder:
 			root = get_root(route.branch, self.current_route.branch)
 			branch_index = len(root)
 			# _branch starts with root.
-			self.source_chain = self.source_chain[:branch_index + 1]
-			self.destination_chain = self.destination_chain[:branch_index + 1]
+			self.truncate(branch_index + 1)
 			self.current_route = Route(root, ())
 			self.current_element = None
 
@@ -82,7 +112,7 @@ class TreeBuilder:
 				parent = self.destination_chain[-1]
 
 				origin = origin_parent[index]
-				new = element_selfcopy(origin)
+				new = element_selfcopy(origin, declared_namespaces(origin))
 				parent.append(new)
 
 				self.source_chain.append(origin)
@@ -101,6 +131,77 @@ class TreeBuilder:
 				self.current_element = new
 				self.current_route = route
 
+	def truncate(self, depth: int):
+		"Leave chains up to depth. Elements below are complete, nothing will be appended to them."
+		del self.source_chain[depth:]
+		del self.destination_chain[depth:]
+
+	def close(self):
+		"Destination tree is complete."
+
+
+class Writer(Protocol):
+	def start(self, element: Element):
+		...
+
+	def end(self, element: Element):
+		...
+
+	def element(self, element: Element):
+		...
+
+	def close(self):
+		...
+
+
+@dataclass
+class StreamingTreeBuilder(TreeBuilder):
+	"""
+	Builder writes elements as soon as they are complete. Destination keeps chain of open elements only.
+	Written children are removed from their parents, so destination tree is not a document after building.
+
+	Start tag of element in chain is written when element gets a child or a text, it is written in empty form otherwise.
+	Element is complete when builder leaves it by truncate. Element in the end of chain can get new children
+	till truncate, it is written on truncate also. Processor of text must be closed before copy.
+	"""
+	writer: Writer
+	# Start tags are written for prefix of destination chain.
+	opened: int = field(default=0, init=False)
+
+	def flush(self):
+		"Write everything in destination chain except elements of chain themselves."
+		chain = self.destination_chain
+		for depth, element in enumerate(chain):
+			last = depth + 1 == len(chain)
+			if depth == self.opened:
+				if last and not (element.text or len(element)):
+					break
+				self.writer.start(element)
+				self.opened += 1
+			# Element of chain is the last child of its parent in chain.
+			complete = len(element) if last else len(element) - 1
+			for child in element[:complete]:
+				self.writer.element(child)
+			del element[:complete]
+
+	def truncate(self, depth: int):
+		if depth < len(self.destination_chain):
+			self.flush()
+		while len(self.destination_chain) > depth:
+			element = self.destination_chain.pop()
+			if len(self.destination_chain) < self.opened:
+				self.opened -= 1
+				self.writer.end(element)
+			else:
+				self.writer.element(element)
+			if self.destination_chain:
+				del self.destination_chain[-1][-1]
+		del self.source_chain[depth:]
+
+	def close(self):
+		self.truncate(0)
+		self.writer.close()
+
 
 @dataclass(frozen=True)
 class Boundary:
@@ -119,6 +220,15 @@ def get_chain(tree_root, path: Path):
 		yield node
 
 
+def move_chain(tree_root: Element, chain: List[Element], path: Path, depth: int):
+	"Move chain of ancestors to path. Elements of chain before depth are common with previous path and they are kept."
+	del chain[depth:]
+	node = chain[-1] if chain else tree_root
+	for index in path[depth:]:
+		node = node[index]
+		chain.append(node)
+
+
 def make_ending_range(chain, pointer_path, waterline):
 	ending = []
 	for i in range(len(pointer_path)-1, waterline, -1):
@@ -142,7 +252,7 @@ def delineate_boundaries(tree_root: Element, line: Line) -> Mapping[Index, Bound
 	registry = {}
 	pointers = map(itemgetter(0), line)
 	previous_pointer = next(pointers)
-	previous_route = tuple(get_chain(tree_root, previous_pointer.path))
+	previous_route = list(get_chain(tree_root, previous_pointer.path))
 	common_root = previous_pointer.path
 	for pointer in pointers:
 		if previous_pointer.path != pointer.path:
@@ -163,9 +273,9 @@ def delineate_boundaries(tree_root: Element, line: Line) -> Mapping[Index, Bound
 				opening = make_opening_range(pointer.path, branch_index+1)
 
 			registry[pointer.index] = Boundary(ending=ending, gap=gap, opening=opening)
+			move_chain(tree_root, previous_route, pointer.path, branch_index)
 
 		previous_pointer = pointer
-		previous_route = tuple(get_chain(tree_root, previous_pointer.path))
 		common_root = get_root(common_root, previous_pointer.path)
 
 	branch_index = len(common_root)
@@ -196,7 +306,14 @@ class LoopBody:
 	stop: ElementPosition
 
 
-def enforce(source: Element, tape: Iterator[Tuple[ElementPointer, str]], boundaries: Mapping[Index, Boundary], processor_factory: Callable) -> TreeBuilder:
+def enforce(
+	source: Element,
+	tape: Iterator[Tuple[ElementPointer, str]],
+	boundaries: Mapping[Index, Boundary],
+	processor_factory: Callable,
+	builder: Optional[TreeBuilder] = None,
+) -> TreeBuilder:
+	"Builder is closed in the end. Default builder makes complete destination tree."
 	def iterate_boundaries(boundaries, start, stop):
 		for index in range(start, stop):
 			yield index, boundaries[index]
@@ -214,7 +331,8 @@ def enforce(source: Element, tape: Iterator[Tuple[ElementPointer, str]], boundar
 			yield up.opening, len(down.gap.branch) + 1
 			up = down
 
-	builder = TreeBuilder(source)
+	if builder is None:
+		builder = TreeBuilder(source)
 
 	previous_present = ElementPosition(path=(), index=min(boundaries)-1)
 	previous_discarded = None
@@ -239,14 +357,14 @@ def enforce(source: Element, tape: Iterator[Tuple[ElementPointer, str]], boundar
 			last_discard = True
 		else:
 			last_discard = False
-		build = False
 		# build
 		if loop_body:
-			routes = ()
+			routes = []
 
 			next_to_previous_index = previous_present.index + 1
 			previous_boundary = boundaries[next_to_previous_index]
-			routes += previous_boundary.ending + (previous_boundary.gap,)
+			routes.extend(previous_boundary.ending)
+			routes.append(previous_boundary.gap)
 			level = boundaries[next_to_previous_index].gap.branch
 
 			# close from present to loop_body.stop
@@ -259,7 +377,7 @@ def enforce(source: Element, tape: Iterator[Tuple[ElementPointer, str]], boundar
 					rolling_index = index
 					for route in boundary.ending+(boundary.gap,):
 						if level > route.branch:
-							routes += route,
+							routes.append(route)
 							level = route.branch
 					if level == watermark:
 						break
@@ -279,26 +397,29 @@ def enforce(source: Element, tape: Iterator[Tuple[ElementPointer, str]], boundar
 				while prelude and (len(prelude[-1].branch) + bool(prelude[-1].crossroad)) > lower_depth:
 					prelude.pop()
 
-			routes += tuple(prelude)
+			routes.extend(prelude)
 
 			# self prelude
 			if True:
-				routes += boundaries[pointer.index].gap,
-			routes += boundaries[pointer.index].opening
+				routes.append(boundaries[pointer.index].gap)
+			routes.extend(boundaries[pointer.index].opening)
 
 			# copy self
-			routes += Route(pointer.path[:-1], pointer.path[-1:]),
+			routes.append(Route(pointer.path[:-1], pointer.path[-1:]))
 			# empty crossroads are critical here. it reset state of builder.
+			if processor is not None:
+				processor.close()
+				processor = None
 			builder.copy(routes)
-			build = True
 
 		# XXX: this condition is wrong for identifying builder.copy needs (copy presented node or allocate node for set_text).
 		elif previous_present.path != pointer.path:
-			routes = ()
+			routes = []
 
 			next_to_previous_index = previous_present.index + 1
 			previous_boundary = boundaries[next_to_previous_index]
-			routes += previous_boundary.ending + (previous_boundary.gap,)
+			routes.extend(previous_boundary.ending)
+			routes.append(previous_boundary.gap)
 			level = boundaries[next_to_previous_index].gap.branch
 
 			if last_discard:
@@ -315,7 +436,7 @@ def enforce(source: Element, tape: Iterator[Tuple[ElementPointer, str]], boundar
 						rolling_index = index
 						for route in boundary.ending+(boundary.gap,):
 							if level > route.branch:
-								routes += route,
+								routes.append(route)
 								level = route.branch
 						if level == watermark:
 							break
@@ -339,23 +460,24 @@ def enforce(source: Element, tape: Iterator[Tuple[ElementPointer, str]], boundar
 						while prelude and (len(prelude[-1].branch) + bool(prelude[-1].crossroad)) > lower_depth:
 							prelude.pop()
 
-					routes += tuple(prelude)
+					routes.extend(prelude)
 
 			# self prelude
 			if last_discard:
-				routes += boundaries[pointer.index].gap,
-			routes += boundaries[pointer.index].opening
+				routes.append(boundaries[pointer.index].gap)
+			routes.extend(boundaries[pointer.index].opening)
 
 			# copy self
-			routes += Route(pointer.path[:-1], pointer.path[-1:]),
+			routes.append(Route(pointer.path[:-1], pointer.path[-1:]))
+			if processor is not None:
+				processor.close()
+				processor = None
 			builder.copy(filter(attrgetter('crossroad'), routes))
-			build = True
 
 		# set text
 		if not pointer.is_constant and text:
-			if build:
-				if processor is not None:
-					processor.close()
+			# Processor is closed on build, streaming builder writes elements of previous one.
+			if processor is None:
 				processor = processor_factory(builder.destination_chain[-1], builder.current_element)
 			processor.feed(text)
 
@@ -369,10 +491,11 @@ def enforce(source: Element, tape: Iterator[Tuple[ElementPointer, str]], boundar
 
 	last_index = max(boundaries)
 
-	routes = ()
+	routes = []
 	next_to_previous_index = previous_present.index + 1
 	previous_boundary = boundaries[next_to_previous_index]
-	routes += previous_boundary.ending + (previous_boundary.gap,)
+	routes.extend(previous_boundary.ending)
+	routes.append(previous_boundary.gap)
 	level = boundaries[next_to_previous_index].gap.branch
 	# 1) continue closing
 	if last_discard:
@@ -388,13 +511,14 @@ def enforce(source: Element, tape: Iterator[Tuple[ElementPointer, str]], boundar
 				rolling_index = index
 				for route in boundary.ending+(boundary.gap,):
 					if level > route.branch:
-						routes += route,
+						routes.append(route)
 						level = route.branch
 				if level == watermark:
 					break
 	# copy current
-	routes += boundaries[last_index].opening
+	routes.extend(boundaries[last_index].opening)
 	builder.copy(filter(attrgetter('crossroad'), routes))
+	builder.close()
 
 	return builder
 
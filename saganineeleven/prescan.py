@@ -0,0 +1,66 @@
+# Copyright 2021 Stepan Bakshayev
+#
+# This file is part of saganineeleven.
+#
+# saganineeleven is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License.
+#
+# saganineeleven is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with saganineeleven.  If not, see <https://www.gnu.org/licenses/>.
+"""
+Prescan looks for openers of template terminals in raw bytes of xml before building of tree.
+Part without any opener is plaintext definitely. Part with opener is passed to straighten for real answer.
+
+Prescan must be conservative. Opener can be splitted across runs by markup, for example
+`{</w:t></w:r><w:r><w:t>%`. Character can be written as reference, for example `&#123;`.
+Everything between characters of opener is skipped: tags with quoted attributes, comments, processing instructions,
+references and character data. Document handler does not feed text of some elements to lexer (w:delText, w:instrText),
+so text between runs does not break opener. Only characters of openers stop the gap.
+Unusual things (CDATA, DOCTYPE, other than ASCII compatible encodings) are reported as possible template.
+"""
+import re
+from typing import Callable
+
+GAP = rb'(?:<!--.*?-->|<\?.*?\?>|<(?:[^>"\']|"[^"]*"|\'[^\']*\')*>|&[^;<]*;|[^<&%s])*'
+UNUSUAL = re.compile(rb'<!\[CDATA\[|<!DOCTYPE')
+# Byte order marks mean UTF-16 or UTF-32.
+WIDE_ENCODING_MARKS = b'\xff\xfe', b'\xfe\xff'
+
+
+def case_insensitive(text: str) -> bytes:
+	return b''.join(f'[{c.lower()}{c.upper()}]'.encode() if c.isalpha() else c.encode() for c in text)
+
+
+def character_pattern(character: str) -> bytes:
+	code = ord(character)
+	return b'(?:%s|&#0*%d;|&#[xX]0*%s;)' % (re.escape(character.encode('utf-8')), code, case_insensitive(f'{code:x}'))
+
+
+def make_prescan(*openers: str) -> Callable[[bytes], bool]:
+	"Make function to answer whether xml content may contain any of openers."
+	gap = GAP % re.escape(''.join(sorted(set(''.join(openers)))).encode('utf-8'))
+	pattern = re.compile(b'|'.join(gap.join(map(character_pattern, opener)) for opener in openers), re.DOTALL)
+	# Regex search with alternatives in the beginning is as slow as parsing of xml.
+	# Candidates are found by bytes.find, it is much faster. Regex checks candidate only.
+	starts = {opener[0].encode('utf-8') for opener in openers} | {b'&#'}
+
+	def prescan(data: bytes) -> bool:
+		if data.startswith(WIDE_ENCODING_MARKS) or b'\x00' in data[:4]:
+			return True
+		if UNUSUAL.search(data):
+			return True
+		for start in starts:
+			position = data.find(start)
+			while position != -1:
+				if pattern.match(data, position):
+					return True
+				position = data.find(start, position+1)
+		return False
+
+	return prescan
@@ -0,0 +1,142 @@
+# Copyright 2021 Stepan Bakshayev
+#
+# This file is part of saganineeleven.
+#
+# saganineeleven is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License.
+#
+# saganineeleven is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with saganineeleven.  If not, see <https://www.gnu.org/licenses/>.
+"""
+Registry holds compiled templates in memory of process. Memory is limited by budget in bytes.
+Least recently used template is evicted first.
+
+Template is looked up by path or by key. Path is checked for modification time on each lookup.
+Changed file is hashed and compiled again only if content is really changed.
+Template by key is given with source stream. Content of stream is hashed on each lookup.
+"""
+from collections import OrderedDict
+from dataclasses import dataclass, replace
+from io import BytesIO
+from os import stat
+from sys import getsizeof
+from threading import Lock
+from typing import BinaryIO, Hashable, Optional
+
+from .document import CompiledTemplate, DocumentHandler, TemplateHandler, XmlBackend, compile, make_digest
+from .contrib import elementtree
+
+# Rough sizes of python objects for estimation. They are measured on CPython 64 bit.
+ELEMENT_SIZE = 200
+LINE_ITEM_SIZE = 320
+BOUNDARY_SIZE = 480
+
+
+def measure(compiled: CompiledTemplate) -> int:
+	"Estimate memory held by compiled template in bytes."
+	size = 0
+	for part in compiled.parts:
+		size += len(part.data) + getsizeof(part.template)
+		size += len(part.line) * LINE_ITEM_SIZE + sum(len(text) for _, text in part.line)
+		size += len(part.boundaries) * BOUNDARY_SIZE
+		if part.root is not None:
+			for element in part.root.iter():
+				size += ELEMENT_SIZE + len(element.text or '') + len(element.tail or '')
+				size += sum(len(k) + len(v) for k, v in element.attrib.items())
+	return size
+
+
+@dataclass(frozen=True)
+class Entry:
+	template: CompiledTemplate
+	digest: bytes
+	mtime: Optional[int]
+	size: int
+
+
+@dataclass
+class Statistics:
+	hits: int = 0
+	misses: int = 0
+	evictions: int = 0
+	entries: int = 0
+	size: int = 0
+
+
+class Registry:
+	def __init__(self, budget: int):
+		self.budget = budget
+		self.entries = OrderedDict()
+		self.statistics = Statistics()
+		self.lock = Lock()
+
+	def get(
+		self,
+		key: Hashable,
+		document_handler: DocumentHandler,
+		template_handler: TemplateHandler,
+		source: Optional[BinaryIO] = None,
+		backend: XmlBackend = elementtree,
+	) -> CompiledTemplate:
+		"""
+		Key is path of template file if source is not given.
+		"""
+		mtime = None
+		if source is None:
+			mtime = stat(key).st_mtime_ns
+		identity = key, document_handler.__name__, template_handler.__name__, backend.__name__
+
+		with self.lock:
+			entry = self.entries.get(identity)
+			if entry is not None and mtime is not None and entry.mtime == mtime:
+				self.entries.move_to_end(identity)
+				self.statistics.hits += 1
+				return entry.template
+
+		if source is None:
+			with open(key, 'rb') as stream:
+				data = stream.read()
+		else:
+			data = source.read()
+		digest = make_digest(data)
+
+		if entry is not None and entry.digest == digest:
+			with self.lock:
+				if identity in self.entries:
+					self.entries[identity] = replace(entry, mtime=mtime)
+					self.entries.move_to_end(identity)
+				self.statistics.hits += 1
+			return entry.template
+
+		previous = entry.template if entry is not None else None
+		template = compile(BytesIO(data), document_handler, template_handler, previous=previous, backend=backend)
+		entry = Entry(template, digest, mtime, measure(template))
+
+		with self.lock:
+			self.statistics.misses += 1
+			self.discard(identity)
+			self.entries[identity] = entry
+			self.statistics.size += entry.size
+			while self.statistics.size > self.budget and self.entries:
+				self.discard(next(iter(self.entries)))
+				self.statistics.evictions += 1
+			self.statistics.entries = len(self.entries)
+
+		return template
+
+	def discard(self, identity):
+		entry = self.entries.pop(identity, None)
+		if entry is not None:
+			self.statistics.size -= entry.size
+
+	def clear(self):
+		with self.lock:
+			self.entries.clear()
+			self.statistics.size = 0
+			self.statistics.entries = 0
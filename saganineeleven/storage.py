@@ -0,0 +1,223 @@
+# Copyright 2021 Stepan Bakshayev
+#
+# This file is part of saganineeleven.
+#
+# saganineeleven is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License.
+#
+# saganineeleven is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with saganineeleven.  If not, see <https://www.gnu.org/licenses/>.
+"""
+Storage keeps compiled template on disk. Workers load it without parsing of xml and without straightening.
+
+Layout of file:
+- MAGIC;
+- length of index as 8 bytes little endian;
+- index: msgpack map with version, names of handlers and list of parts (name, digest, content type, zip info, offset, length);
+- blobs of parts one by one. Offset of blob is counted from the end of index.
+
+Blob of plaintext part is compressed data of zip member. Loader does not copy it, part refers to mapped memory.
+Blob of template part is msgpack array of tree, line, boundaries, template and table of pointers.
+
+Tree is stored flat in preorder. Each node is tag, attributes, text, tail, count of children and namespaces.
+Tags and names of attributes are repeated a lot, they are stored once in table of names.
+Namespaces are prefixes declared by node itself for lxml backend. ElementTree does not have them.
+"""
+from mmap import ACCESS_READ, mmap
+from typing import BinaryIO, Callable, Dict, List
+from xml.etree.ElementTree import Element
+from zipfile import ZipInfo
+
+from msgpack import packb, unpackb
+
+from .document import CompiledTemplate, DocumentHandler, Part, TemplateHandler, XmlBackend
+from .contrib import elementtree
+from .executor import Boundary, Route, declared_namespaces
+from .straighten import ContentType, ElementPointer
+
+MAGIC = b'S9N11\x00\x00\x00'
+VERSION = 5
+INDEX_LENGTH_SIZE = 8
+
+
+def pack_tree(root: Element) -> list:
+	names: Dict[str, int] = {}
+
+	def name(value):
+		return names.setdefault(value, len(names))
+
+	nodes = []
+	stack = [root]
+	while stack:
+		node = stack.pop()
+		# Frozen placeholder is stored as its subtree.
+		thaw = getattr(node, 'thaw', None)
+		if thaw is not None:
+			node = thaw()
+		attrib = []
+		for key, value in node.attrib.items():
+			attrib += name(key), value
+		# Default namespace has None prefix, it is not allowed as key of map by msgpack.
+		namespaces = []
+		for prefix, uri in (declared_namespaces(node) or {}).items():
+			namespaces += prefix, uri
+		nodes.append((name(node.tag), attrib, node.text, node.tail, len(node), namespaces))
+		stack.extend(reversed(node))
+
+	return [list(names), nodes]
+
+
+def unpack_tree(names: List[str], nodes: list, make_element: Callable) -> Element:
+	root = None
+	# Element and count of children are waiting to be appended.
+	stack = []
+	for tag, attrib, text, tail, count, namespaces in nodes:
+		attrib = {names[k]: v for k, v in zip(attrib[::2], attrib[1::2])}
+		nsmap = dict(zip(namespaces[::2], namespaces[1::2]))
+		if not stack:
+			element = make_element(names[tag], attrib, nsmap)
+		elif nsmap:
+			element = stack[-1][0].makeelement(names[tag], attrib, nsmap)
+		else:
+			element = stack[-1][0].makeelement(names[tag], attrib)
+		element.text = text
+		element.tail = tail
+		if stack:
+			parent = stack[-1]
+			parent[0].append(element)
+			parent[1] -= 1
+		else:
+			root = element
+		stack.append([element, count])
+		while stack and not stack[-1][1]:
+			stack.pop()
+
+	return root
+
+
+INFO_FIELDS = (
+	'date_time', 'compress_type', 'comment', 'extra', 'create_system', 'create_version', 'extract_version',
+	'flag_bits', 'volume', 'internal_attr', 'external_attr', 'CRC', 'compress_size', 'file_size',
+)
+
+
+def pack_info(info: ZipInfo) -> list:
+	return [getattr(info, name) for name in INFO_FIELDS]
+
+
+def unpack_info(name: str, data) -> ZipInfo:
+	info = ZipInfo(name)
+	for field, value in zip(INFO_FIELDS, data):
+		setattr(info, field, value)
+	return info
+
+
+def pack_route(route: Route) -> list:
+	return [route.branch, route.crossroad]
+
+
+def unpack_route(data) -> Route:
+	return Route(*data)
+
+
+def pack_part(part: Part) -> bytes:
+	line = [(pointer.path, pointer.is_constant, pointer.index, text) for pointer, text in part.line]
+	boundaries = [
+		(index, list(map(pack_route, b.ending)), pack_route(b.gap), list(map(pack_route, b.opening)))
+		for index, b in part.boundaries.items()
+	]
+	# Template contains surrogates. Msgpack does not accept it as string.
+	template = part.template.encode('utf-8', 'surrogatepass')
+	table = [(pointer.path, pointer.is_constant, pointer.index) for pointer in part.table]
+	return packb([pack_tree(part.root), line, boundaries, template, table], use_bin_type=True)
+
+
+def unpack_part(name: str, digest: bytes, content_type: ContentType, blob, backend: XmlBackend) -> Part:
+	tree, line, boundaries, template, table = unpackb(blob, use_list=False, raw=False)
+	names, nodes = tree
+	return Part(
+		name=name,
+		digest=digest,
+		data=b'',
+		content_type=content_type,
+		root=unpack_tree(names, nodes, backend.make_element),
+		line=[(ElementPointer(path, is_constant, index), text) for path, is_constant, index, text in line],
+		boundaries={
+			index: Boundary(tuple(map(unpack_route, ending)), unpack_route(gap), tuple(map(unpack_route, opening)))
+			for index, ending, gap, opening in boundaries
+		},
+		template=template.decode('utf-8', 'surrogatepass'),
+		table=tuple(ElementPointer(*pointer) for pointer in table),
+	)
+
+
+def dump(compiled: CompiledTemplate, destination: BinaryIO):
+	parts = []
+	blobs = []
+	offset = 0
+	for part in compiled.parts:
+		info = None
+		if part.content_type is ContentType.template:
+			blob = pack_part(part)
+		else:
+			blob = part.data
+			info = pack_info(part.info)
+		parts.append((part.name, part.digest, part.content_type.name, info, offset, len(blob)))
+		blobs.append(blob)
+		offset += len(blob)
+
+	index = packb({
+		'version': VERSION,
+		'document_handler': compiled.document_handler.__name__,
+		'template_handler': compiled.template_handler.__name__,
+		'parts': parts,
+	}, use_bin_type=True)
+
+	destination.write(MAGIC)
+	destination.write(len(index).to_bytes(INDEX_LENGTH_SIZE, 'little'))
+	destination.write(index)
+	for blob in blobs:
+		destination.write(blob)
+
+
+def load(
+	source: BinaryIO,
+	document_handler: DocumentHandler,
+	template_handler: TemplateHandler,
+	backend: XmlBackend = elementtree,
+) -> CompiledTemplate:
+	"""
+	Source must be a real file. It is mapped in memory.
+	Trees are made by backend, compiled template does not depend on backend used for compilation.
+	"""
+	memory = memoryview(mmap(source.fileno(), 0, access=ACCESS_READ))
+	if memory[:len(MAGIC)] != MAGIC:
+		raise RuntimeError(f'Source {source!r} is not compiled template.', source)
+
+	position = len(MAGIC) + INDEX_LENGTH_SIZE
+	index_length = int.from_bytes(memory[len(MAGIC):position], 'little')
+	index = unpackb(memory[position:position+index_length], use_list=False, raw=False)
+	position += index_length
+
+	if index['version'] != VERSION:
+		raise RuntimeError(f'Unsupported version {index["version"]} of compiled template. Supported {VERSION}.', index['version'], VERSION)
+	for kind, handler in ('document_handler', document_handler), ('template_handler', template_handler):
+		if index[kind] != handler.__name__:
+			raise RuntimeError(f'Compiled template is made by {kind} {index[kind]}, but {handler.__name__} is given.', kind, index[kind], handler.__name__)
+
+	parts = []
+	for name, digest, content_type, info, offset, length in index['parts']:
+		content_type = ContentType[content_type]
+		blob = memory[position+offset:position+offset+length]
+		if content_type is ContentType.template:
+			parts.append(unpack_part(name, digest, content_type, blob, backend))
+		else:
+			parts.append(Part(name, digest, blob, content_type, unpack_info(name, info)))
+
+	return CompiledTemplate(document_handler, template_handler, tuple(parts), backend)
@@ -13,14 +13,19 @@
 #
 # You should have received a copy of the GNU General Public License
 # along with saganineeleven.  If not, see <https://www.gnu.org/licenses/>.
-from dataclasses import dataclass, replace
+from abc import ABC, abstractmethod
+from bisect import bisect_left, bisect_right
+from collections import deque
+from dataclasses import dataclass, field, replace
 from enum import Enum
-from itertools import chain
-from typing import Callable, Iterable, Mapping, Sequence, Tuple
+from itertools import accumulate
+from typing import BinaryIO, Callable, ClassVar, Container, Iterable, Iterator, List, Mapping, Optional, Pattern, Sequence, Tuple
 from xml.etree.ElementTree import Element
 
 from typing_extensions import Protocol
 
+from .contrib import elementtree
+
 Token = Enum('Event', 'text terminal', module=__name__)
 
 
@@ -51,13 +56,25 @@ class ShadowElement:
 
 
 class elementstr(str):
-	__slots__ = 'elements',
+	"""
+	String with elements. Elements are assigned from outside after creation.
+	Cumulative lengths of elements are kept for bisect in slicing. They are calculated on first slicing and
+	they are calculated again if elements are assigned again.
+	"""
+	__slots__ = 'elements', 'cumulative'
 
 	def __iadd__(self, other):
 		new = self.__class__(f'{self!s}{other!s}')
 		new.elements = getattr(self, 'elements', ()) + getattr(other, 'elements', ())
 		return new
 
+	def get_ends(self) -> Sequence[int]:
+		"Return ends of elements in string."
+		cumulative = getattr(self, 'cumulative', None)
+		if cumulative is None or cumulative[0] is not self.elements:
+			cumulative = self.cumulative = self.elements, tuple(accumulate(e.length for e in self.elements))
+		return cumulative[1]
+
 	def __getitem__(self, key):
 		assert isinstance(key, slice), type(key)
 		assert key.step in (None, 1), key.step
@@ -68,23 +85,18 @@ class elementstr(str):
 		# It are mircooptimization and algorithm requirement.
 		if start < len(self):
 			assert self.elements
-			cursor = 0
-			elements = iter(self.elements)
-			for element in elements:
-				if cursor <= start < element.length + cursor:
-					break
-				cursor += element.length
-			# There are valid element anyway guaranteed by upper condition guard (aka "algorithm requirement").
-			element_offset = start - cursor
-			start_element = replace(element, offset=(element.offset+element_offset), length=(element.length-element_offset))
-			cursor += element_offset
-			new_elements = []
-			for element in chain((start_element,), elements):
-				element = replace(element, length=min(element.length, stop-cursor))
-				new_elements.append(element)
-				cursor += element.length
-				if cursor == stop:
-					break
+			ends = self.get_ends()
+			# First element is containing start, zero length elements before it are skipped.
+			first = bisect_right(ends, start)
+			# Last element is reaching stop, zero length elements after it are skipped.
+			last = bisect_left(ends, stop, first)
+			new_elements = list(self.elements[first:last+1])
+
+			element = new_elements[0]
+			element_offset = start - (ends[first-1] if first else 0)
+			new_elements[0] = replace(element, offset=(element.offset+element_offset), length=(element.length-element_offset))
+			element = new_elements[-1]
+			new_elements[-1] = replace(element, length=stop-(start if first == last else ends[last-1]))
 
 			for index in 0, -1:
 				element = new_elements[index]
@@ -101,6 +113,48 @@ class elementstr(str):
 		return f"<elementstr: '{self!s}', {getattr(self, 'elements', ())}>"
 
 
+class elementrope:
+	"""
+	Accumulator of elementstr. Concatenation appends to lists and does not copy accumulated string and elements.
+	String is joined on demand. Slicing has semantic of elementstr.
+	"""
+	__slots__ = 'chunks', 'elements', 'length'
+
+	def __init__(self, *chunks):
+		self.chunks = []
+		self.elements = []
+		self.length = 0
+		for chunk in chunks:
+			self += chunk
+
+	def __iadd__(self, other):
+		text = str(other)
+		if text:
+			self.chunks.append(text)
+		self.elements.extend(getattr(other, 'elements', ()))
+		self.length += len(text)
+		return self
+
+	def __len__(self):
+		return self.length
+
+	def __str__(self):
+		if len(self.chunks) > 1:
+			self.chunks[:] = ''.join(self.chunks),
+		return self.chunks[0] if self.chunks else ''
+
+	def materialize(self) -> elementstr:
+		new = elementstr(str(self))
+		new.elements = tuple(self.elements)
+		return new
+
+	def __getitem__(self, key):
+		return self.materialize()[key]
+
+	def __repr__(self):
+		return f"<elementrope: '{self!s}', {tuple(self.elements)}>"
+
+
 class LexerProtocol(Protocol):
 	def feed(self, chunk):
 		...
@@ -112,6 +166,80 @@ class LexerProtocol(Protocol):
 		pass
 
 
+@dataclass
+class BufferedLexer(ABC):
+	"""
+	Base of lexers of template handlers. Template engines do not have incremental lexer.
+	Buffer is scanned again by find_terminals when chunk can complete terminal.
+	Text before possible start of terminal is drained to events. Buffer holds pending terminal only.
+
+	Subclass gives find_terminals and opener_re. Opener_re finds position of possible start of terminal,
+	it matches first character of opener in the end of buffer also, next chunk can complete opener.
+	"""
+	buffer: elementrope = field(default_factory=elementrope, init=False)
+	is_closed: bool = field(default=False, init=False)
+	is_pending: bool = field(default=False, init=False)
+	events: deque = field(default_factory=deque, init=False)
+
+	opener_re: ClassVar[Pattern]
+
+	@abstractmethod
+	def find_terminals(self, text: str) -> Iterable[Tuple[Token, int, int]]:
+		"Return spans of complete terminals. Text spans are allowed between them."
+
+	def feed(self, chunk):
+		assert not self.is_closed
+		self.buffer += chunk
+		# Every terminal ends with brace. There is no chance for new match without brace in chunk.
+		if '}' in chunk:
+			buffer = self.buffer.materialize()
+			last_position = 0
+			for token, start, end in self.find_terminals(str(buffer)):
+				if last_position < start:
+					self.events.append((Token.text, buffer[last_position:start]))
+				# buffer is special type. Ignore match and use it method for slicing.
+				if start < end:
+					self.events.append((token, buffer[start:end]))
+				last_position = end
+
+			# perform cutting if there is a any match
+			if last_position:
+				self.buffer = elementrope(buffer[last_position:])
+				self.is_pending = False
+
+		if not self.is_pending:
+			self.drain()
+
+	def drain(self):
+		"Buffer is cut on boundary of elements. The text is the same as engine sees, events just come earlier."
+		buffer = self.buffer.materialize()
+		match = self.opener_re.search(buffer)
+		limit = len(buffer) if match is None else match.start()
+		# Incomplete opener in the end can be denied by next chunk. Check it again next time.
+		self.is_pending = match is not None and match.group() != '{'
+
+		position = 0
+		for element in buffer.elements:
+			if position + element.length > limit:
+				break
+			position += element.length
+
+		if position:
+			self.events.append((Token.text, buffer[:position]))
+			self.buffer = elementrope(buffer[position:])
+
+	def close(self):
+		self.is_closed = True
+
+	def read_events(self):
+		while self.events:
+			yield self.events.popleft()
+		if self.is_closed and self.buffer:
+			yield Token.text, self.buffer.materialize()
+			self.buffer = None
+			self.events = None
+
+
 ContentType = Enum('ContentType', 'plaintext template', module=__name__)
 
 
@@ -149,10 +277,25 @@ def compress(element: elementstr) -> elementstr:
 	return element
 
 
-def travel(node: Element, level=0):
-	yield level, node
-	for child in node:
-		yield from travel(child, level+1)
+def travel(root: Element, leaves: Container[str] = ()) -> Iterator[Tuple[Path, Element]]:
+	"""
+	Travel tree in depth first order. Yield path and element. Children of leaves are not traveled.
+	Path is made from path of parent, there is no search of element in children of parent.
+	"""
+	yield (), root
+	if root.tag in leaves:
+		return
+	stack = [((), iter(enumerate(root)))]
+	while stack:
+		path, children = stack[-1]
+		for index, child in children:
+			child_path = path + (index,)
+			yield child_path, child
+			if len(child) and child.tag not in leaves:
+				stack.append((child_path, iter(enumerate(child))))
+				break
+		else:
+			stack.pop()
 
 
 @dataclass(frozen=True)
@@ -165,6 +308,72 @@ class ElementPointer:
 Line = Sequence[Tuple[ElementPointer, str]]
 
 
+@dataclass
+class LineBuilder:
+	"Line is made from events of lexer as soon as they come. Lexer does not hold events till the end of document."
+	line: list = field(default_factory=list)
+	content_type: ContentType = ContentType.plaintext
+	index: int = 0
+	previous_path: Path = ()
+
+	def extend(self, events: Iterable[Tuple[Token, elementstr]]):
+		for token, estr in events:
+			elements, text = estr.elements, str(estr)
+			if token is Token.terminal:
+				self.content_type = ContentType.template
+
+				first, *rest = elements
+				container = tuple(reversed(first.path))[-first.atom:]
+				if any(container != tuple(reversed(e.path))[-e.atom:] for e in rest):
+					raise RuntimeError(f'Terminal {token} `{text!s}` is splitted across different atoms {elements!r}.', token, text, elements)
+
+				# There are two interesting cases for further processing.
+				# It is substitution with variable. It is coping with cycle.
+				# Terminal is consuming by template engine. Leaves breadcrumbs before for variable and after for cycle.
+				# Once more terminal can be splitted by many elements, use first and ignore others.
+				# XXX: this is wrong. It is Poor's man solution.
+				head, tail = elements[0], elements[-1]
+				elements = replace(head, length=len(estr), is_constant=False),
+				for element in rest:
+					elements += replace(element, offset=element.offset+element.length, length=0, is_constant=False),
+
+			offset = 0
+			for element in elements:
+				# XXX: put in test check for continuous index numbers.
+				if element.path != self.previous_path:
+					self.index += 1
+					self.previous_path = element.path
+				self.line.append((
+					ElementPointer(path=element.path, is_constant=element.is_constant, index=self.index),
+					text[offset:offset+element.length],
+				))
+				offset += element.length
+
+
+def feed_text_node(
+	lexer: LexerProtocol,
+	text_nodes: Mapping[str, int],
+	converter: Callable[[Element], Iterable[Tuple[Path, str]]],
+	branch_path: Path,
+	element: Element,
+) -> Sequence[Path]:
+	"Return paths of texts inside text node."
+	paths = []
+	for path, text in converter(element):
+		paths.append(path)
+		chunk = elementstr(text)
+		chunk.elements = ShadowElement(
+			path=branch_path+path,
+			atom=text_nodes[element.tag]-len(path)+1,  # below code block is using reverse, prepare data for handling.
+			representation_length=len(chunk),
+			offset=0,
+			length=len(chunk),
+			is_constant=True,
+		),
+		lexer.feed(chunk)
+	return paths
+
+
 def straighten(
 	root: Element,
 	Lexer: LexerProtocol,
@@ -172,70 +381,106 @@ def straighten(
 	converter: Callable[[Element], Iterable[Tuple[Path, str]]]
 ) -> Tuple[ContentType, Line]:
 	lexer = Lexer()
-	content_type = ContentType.plaintext
-	traveler = travel(root)
-	branch = []
-	watermark = None
-	for level, element in traveler:
-		if watermark is not None:
-			if level > watermark:
-				continue
-			watermark = None
-
-		if level+1 <= len(branch):
-			branch[level:] = []
-		branch.append(element)
-
+	builder = LineBuilder()
+	for branch_path, element in travel(root, text_nodes):
 		if element.tag in text_nodes:
-			for path, text in converter(element):
-				chunk = elementstr(text)
-				chunk.elements = ShadowElement(
-					path=tuple(map(lambda z: list(z[0]).index(z[1]), zip(branch, branch[1:])))+path,
-					atom=text_nodes[element.tag]-len(path)+1,  # below code block is using reverse, prepare data for handling.
-					representation_length=len(chunk),
-					offset=0,
-					length=len(chunk),
-					is_constant=True,
-				),
-				lexer.feed(chunk)
-
-			watermark = level
-
-	line = []
-	index = 0
-	previous_path = ()
+			feed_text_node(lexer, text_nodes, converter, branch_path, element)
+			builder.extend(lexer.read_events())
 
 	lexer.close()
-	for token, estr in lexer.read_events():
-		elements, text = estr.elements, str(estr)
-		if token is Token.terminal:
-			content_type = ContentType.template
-
-			first, *rest = elements
-			container = tuple(reversed(first.path))[-first.atom:]
-			if any(container != tuple(reversed(e.path))[-e.atom:] for e in rest):
-				raise RuntimeError(f'Terminal {token} `{text!s}` is splitted across different atoms {elements!r}.', token, text, elements)
-
-			# There are two interesting cases for further processing.
-			# It is substitution with variable. It is coping with cycle.
-			# Terminal is consuming by template engine. Leaves breadcrumbs before for variable and after for cycle.
-			# Once more terminal can be splitted by many elements, use first and ignore others.
-			# XXX: this is wrong. It is Poor's man solution.
-			head, tail = elements[0], elements[-1]
-			elements = replace(head, length=len(estr), is_constant=False),
-			for element in rest:
-				elements += replace(element, offset=element.offset+element.length, length=0, is_constant=False),
+	builder.extend(lexer.read_events())
+	return builder.content_type, builder.line
 
-		offset = 0
-		for element in elements:
-			# XXX: put in test check for continuous index numbers.
-			if element.path != previous_path:
-				index += 1
-				previous_path = element.path
-			line.append((
-				ElementPointer(path=element.path, is_constant=element.is_constant, index=index),
-				text[offset:offset+element.length],
-			))
-			offset += element.length
-
-	return content_type, line
+
+def keep_chain(elements: List[Element], kept: List[bool], waiting: List[List[Index]], freeze: Callable, frozen: dict):
+	"Mark open elements as kept. Complete children of newly kept element are frozen."
+	for depth in range(len(elements)-1, -1, -1):
+		if kept[depth]:
+			break
+		kept[depth] = True
+		parent = elements[depth]
+		for index in waiting[depth]:
+			parent[index] = freeze(parent[index], frozen)
+		waiting[depth] = ()
+
+
+def iterstraighten(
+	source: BinaryIO,
+	Lexer: LexerProtocol,
+	text_nodes: Mapping[str, int],
+	converter: Callable[[Element], Iterable[Tuple[Path, str]]],
+	iterparse: Callable = elementtree.iterparse,
+	freeze: Optional[Callable[[Element, dict], Element]] = None,
+) -> Tuple[Element, ContentType, Line]:
+	"""
+	Variant of straighten over events of iterparse. Lexer is fed by text nodes while tree is being built,
+	there is no second travel over tree and no separate bytes of xml are required.
+	Origin tree is returned anyway, enforce copies its elements by paths.
+	Iterparse must yield start and end events for elements only, comments and processing instructions are not in tree.
+
+	Tree is shrunk by freeze if it is given. Element on path of any text is kept, boundaries and enforce walk to texts
+	through them. Other elements are only copied deep by enforce. Complete subtree of such elements is replaced
+	by frozen placeholder as soon as its parent is known to be kept, see contrib.elementtree.freeze.
+	Equal subtrees share one placeholder.
+	"""
+	lexer = Lexer()
+	builder = LineBuilder()
+	root = None
+	# Paths of open elements and counts of their children met so far.
+	paths = []
+	counts = []
+	# Open elements, whether they are on path of text and indexes of their complete children are waiting for freeze.
+	elements = []
+	kept = []
+	waiting = []
+	frozen = {}
+	# Depth inside text node. Children of text node are not counted like travel does.
+	skip = 0
+	for event, element in iterparse(source):
+		if event == 'start':
+			if skip:
+				skip += 1
+				continue
+			if root is None:
+				root = element
+				paths.append(())
+			else:
+				paths.append(paths[-1] + (counts[-1],))
+				counts[-1] += 1
+			counts.append(0)
+			if freeze is not None:
+				elements.append(element)
+				kept.append(False)
+				waiting.append([])
+			if element.tag in text_nodes:
+				skip = 1
+
+		else:
+			if skip > 1:
+				skip -= 1
+				continue
+			if skip:
+				skip = 0
+				text_paths = feed_text_node(lexer, text_nodes, converter, paths[-1], element)
+				builder.extend(lexer.read_events())
+				if freeze is not None and text_paths:
+					keep_chain(elements, kept, waiting, freeze, frozen)
+					# Children of text node out of paths of texts.
+					heads = {p[0] for p in text_paths if p}
+					for index, child in enumerate(element):
+						if index not in heads and len(child):
+							element[index] = freeze(child, frozen)
+			paths.pop()
+			counts.pop()
+			if freeze is not None:
+				elements.pop()
+				waiting.pop()
+				if not kept.pop() and elements and len(element):
+					if kept[-1]:
+						elements[-1][counts[-1]-1] = freeze(element, frozen)
+					else:
+						waiting[-1].append(counts[-1]-1)
+
+	lexer.close()
+	builder.extend(lexer.read_events())
+	return root, builder.content_type, builder.line
@@ -14,36 +14,78 @@
 # You should have received a copy of the GNU General Public License
 # along with saganineeleven.  If not, see <https://www.gnu.org/licenses/>.
 import re
-from dataclasses import astuple
-from itertools import islice
-from typing import Iterator, Tuple
-
-from msgpack import packb, unpackb
+from typing import Iterable, Iterator, Sequence, Tuple, Union
 
 from .straighten import ElementPointer, Line
 
-# surrogates U+DC80 to U+DCFF
-element_re = re.compile(r'\ud800([\U00000000-\U0010ffff]+?)\ud801')
+# Marker of pointer is placed between opener and closer. Marker is decimal index of pointer in table.
+# Opener and closer are lone surrogates, they are never met in text of document.
+OPENER = '\ud800'
+CLOSER = '\ud801'
+element_re = re.compile(f'{OPENER}([^{CLOSER}]+){CLOSER}')
+
+Table = Tuple[ElementPointer, ...]
+
 
-def stringify(line: Line) -> str:
+def stringify(line: Line) -> Tuple[str, Table]:
+	"""
+	Return template and table of pointers. Table is kept by caller and it is given to parse back.
+	Equal pointers share one index in table, loop bodies repeat short markers only.
+	"""
 	buffer = []
+	indexes = {}
 	for pointer, text in line:
-		buffer.append('\ud800')
-		buffer.append(packb(astuple(pointer)).decode('utf-8', 'surrogateescape'))
-		buffer.append('\ud801')
+		buffer.append(OPENER)
+		buffer.append(str(indexes.setdefault(pointer, len(indexes))))
+		buffer.append(CLOSER)
 		buffer.append(text)
 
-	return ''.join(buffer)
+	return ''.join(buffer), tuple(indexes)
 
 
-def parse(tape: str) -> Iterator[Tuple[ElementPointer, str]]:
-	in_element = True
-	element_dump = None
-	# XXX: There are big memory consumption and big cpu utilization. I don't find any good regexp iterable match.
-	for bit in islice(element_re.split(tape), 1, None):
-		if in_element:
-			element_dump = bit
+def parse(tape: Union[str, Iterable[str]], table: Sequence[ElementPointer]) -> Iterator[Tuple[ElementPointer, str]]:
+	"""
+	Parse tape incrementally. Tape is string or iterable of chunks, marker can be splitted across chunks.
+	Only text of current pointer is hold in memory. Text before first marker is ignored.
+	"""
+	if isinstance(tape, str):
+		tape = tape,
+	pointer = None
+	# Pieces of text of pointer or pieces of marker splitted across chunks.
+	pieces = []
+	in_marker = False
+	for chunk in tape:
+		position = 0
+		if in_marker:
+			end = chunk.find(CLOSER)
+			if end == -1:
+				pieces.append(chunk)
+				continue
+			pieces.append(chunk[:end])
+			pointer = table[int(''.join(pieces))]
+			pieces = []
+			in_marker = False
+			position = end + 1
+
+		for match in element_re.finditer(chunk, position):
+			if pointer is not None:
+				pieces.append(chunk[position:match.start()])
+				yield pointer, ''.join(pieces)
+				pieces = []
+			pointer = table[int(match.group(1))]
+			position = match.end()
+
+		start = chunk.find(OPENER, position)
+		if start == -1:
+			if pointer is not None:
+				pieces.append(chunk[position:])
 		else:
-			yield ElementPointer(*unpackb(element_dump.encode('utf-8', 'surrogateescape'), use_list=False)), bit
-			element_dump = None
-		in_element = not in_element
+			if pointer is not None:
+				pieces.append(chunk[position:start])
+				yield pointer, ''.join(pieces)
+				pieces = []
+			pieces.append(chunk[start+1:])
+			in_marker = True
+
+	if pointer is not None and not in_marker:
+		yield pointer, ''.join(pieces)
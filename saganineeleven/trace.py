@@ -0,0 +1,108 @@
+# Copyright 2021 Stepan Bakshayev
+#
+# This file is part of saganineeleven.
+#
+# saganineeleven is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License.
+#
+# saganineeleven is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with saganineeleven.  If not, see <https://www.gnu.org/licenses/>.
+"""
+Tracer gets start and end of each stage of compile and render. Stage of member of archive has name of part.
+End has details: sizes in bytes and lengths. Stages are nested, for example zip_write of template part contains
+template_render, parse and enforce of it. Render without tracer does not call anything.
+
+Stages run by workers of executor are not traced. Tracer sees zip_read and zip_write only, zip_write contains
+waiting for result of worker.
+"""
+import json
+import os
+import threading
+from dataclasses import dataclass, field
+from time import perf_counter
+from typing import Dict, List, Optional, TextIO
+
+from typing_extensions import Protocol
+
+
+class Tracer(Protocol):
+	def start(self, stage: str, part: Optional[str] = None):
+		...
+
+	def end(self, stage: str, part: Optional[str] = None, **details: int):
+		...
+
+
+@dataclass
+class Stage:
+	count: int = 0
+	# Whole time of stage and time without nested stages.
+	seconds: float = 0.
+	self_seconds: float = 0.
+
+
+@dataclass
+class DictTracer:
+	"""
+	Tracer aggregates time by stage. By part it keeps time and details of each stage, stages report detail with
+	same name and different meaning (size of zip_read and zip_write). Sum of self_seconds of all stages is the whole time.
+	It is for one thread, each render in thread needs its own tracer.
+	"""
+	stages: Dict[str, Stage] = field(default_factory=dict)
+	parts: Dict[str, dict] = field(default_factory=dict)
+	stack: List[list] = field(default_factory=list)
+
+	def start(self, stage: str, part: Optional[str] = None):
+		# Stage, part, start time and time of nested stages.
+		self.stack.append([stage, part, perf_counter(), 0.])
+
+	def end(self, stage: str, part: Optional[str] = None, **details: int):
+		seconds = perf_counter()
+		started, started_part, start, nested = self.stack.pop()
+		if (started, started_part) != (stage, part):
+			raise RuntimeError(f'Stage {stage} of {part} is ended, but stage {started} of {started_part} is started.', stage, part, started, started_part)
+		seconds -= start
+		if self.stack:
+			self.stack[-1][3] += seconds
+
+		aggregate = self.stages.setdefault(stage, Stage())
+		aggregate.count += 1
+		aggregate.seconds += seconds
+		aggregate.self_seconds += seconds - nested
+		if part is not None:
+			self.parts.setdefault(part, {})[stage] = {'seconds': seconds, **details}
+
+
+@dataclass
+class ChromeTracer:
+	"""
+	Tracer keeps events in trace event format of Chrome. It is opened by chrome://tracing or https://ui.perfetto.dev.
+	Events are marked by process and thread, one tracer is shared by threads.
+	"""
+	events: List[dict] = field(default_factory=list)
+
+	def start(self, stage: str, part: Optional[str] = None):
+		self.events.append(self.make_event('B', stage, {} if part is None else {'part': part}))
+
+	def end(self, stage: str, part: Optional[str] = None, **details: int):
+		self.events.append(self.make_event('E', stage, details))
+
+	@staticmethod
+	def make_event(phase: str, stage: str, arguments: dict) -> dict:
+		return {
+			'name': stage,
+			'ph': phase,
+			'ts': perf_counter() * 1_000_000,
+			'pid': os.getpid(),
+			'tid': threading.get_ident(),
+			'args': arguments,
+		}
+
+	def write(self, destination: TextIO):
+		json.dump({'traceEvents': self.events, 'displayTimeUnit': 'ms'}, destination)
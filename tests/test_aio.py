@@ -0,0 +1,165 @@
+# Copyright 2021 Stepan Bakshayev
+#
+# This file is part of saganineeleven.
+#
+# saganineeleven is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License.
+#
+# saganineeleven is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with saganineeleven.  If not, see <https://www.gnu.org/licenses/>.
+import asyncio
+from io import BytesIO
+from concurrent.futures import ThreadPoolExecutor
+from threading import Event, Lock, current_thread
+
+import pytest
+from test_render import make_docx, read_members
+
+from saganineeleven import aio, render
+from saganineeleven.contrib import django, docx
+
+
+class Destination:
+	def __init__(self):
+		self.stream = BytesIO()
+		self.drained = 0
+
+	def write(self, data):
+		self.stream.write(data)
+
+	async def drain(self):
+		self.drained += 1
+
+
+def make_source(name: str) -> asyncio.StreamReader:
+	source = asyncio.StreamReader()
+	source.feed_data(make_docx(name).getvalue())
+	source.feed_eof()
+	return source
+
+
+CONTEXT = {'var1': 'Hello,', 'var2': 'Prince'}
+
+
+def test_render():
+	paragon = BytesIO()
+	render(make_docx('case_03'), paragon, docx, django, CONTEXT)
+
+	async def main():
+		destination = Destination()
+		await aio.render(make_source('case_03'), destination, docx, django, CONTEXT)
+		template = await aio.compile(make_source('case_03'), docx, django)
+		compiled_destination = Destination()
+		await aio.render_compiled(template, CONTEXT, compiled_destination)
+		return destination, compiled_destination
+
+	destination, compiled_destination = asyncio.run(main())
+	assert read_members(destination.stream) == read_members(paragon)
+	assert read_members(compiled_destination.stream) == read_members(paragon)
+	assert destination.drained == 1
+
+
+class SlowHandler:
+	"Template handler waits for permission to render."
+	def __init__(self):
+		self.started = Event()
+		self.permission = Event()
+		self.lock = Lock()
+		self.active = 0
+		self.max_active = 0
+		self.threads = set()
+		self.Lexer = django.Lexer
+
+	def render(self, template_string, context):
+		with self.lock:
+			self.active += 1
+			self.max_active = max(self.max_active, self.active)
+		self.threads.add(current_thread().name)
+		self.started.set()
+		self.permission.wait(5)
+		with self.lock:
+			self.active -= 1
+		return django.render(template_string, context)
+
+
+def test_cancel():
+	handler = SlowHandler()
+	destination = Destination()
+
+	async def main():
+		task = asyncio.create_task(aio.render(make_source('case_03'), destination, docx, handler, CONTEXT))
+		loop = asyncio.get_running_loop()
+		await loop.run_in_executor(None, handler.started.wait, 5)
+		task.cancel()
+		with pytest.raises(asyncio.CancelledError):
+			await task
+		handler.permission.set()
+
+	asyncio.run(main())
+	assert destination.stream.getvalue() == b''
+	assert destination.drained == 0
+
+
+def test_semaphore():
+	handler = SlowHandler()
+
+	async def main():
+		semaphore = asyncio.Semaphore(2)
+		destinations = [Destination() for _ in range(6)]
+		renders = asyncio.gather(*(aio.render(make_source('case_03'), d, docx, handler, CONTEXT, semaphore=semaphore) for d in destinations))
+		loop = asyncio.get_running_loop()
+		await loop.run_in_executor(None, handler.started.wait, 5)
+		await asyncio.sleep(0.1)
+		handler.permission.set()
+		await renders
+		return destinations
+
+	destinations = asyncio.run(main())
+	assert handler.max_active <= 2
+	assert all(d.stream.getvalue() for d in destinations)
+
+
+def test_cancel_semaphore():
+	"Turn of cancelled render is over when its thread is finished."
+	handler = SlowHandler()
+
+	async def main():
+		semaphore = asyncio.Semaphore(1)
+		loop = asyncio.get_running_loop()
+		task = asyncio.create_task(aio.render(make_source('case_03'), Destination(), docx, handler, CONTEXT, semaphore=semaphore))
+		await loop.run_in_executor(None, handler.started.wait, 5)
+		task.cancel()
+		with pytest.raises(asyncio.CancelledError):
+			await task
+
+		destination = Destination()
+		second = asyncio.create_task(aio.render(make_source('case_03'), destination, docx, handler, CONTEXT, semaphore=semaphore))
+		await asyncio.sleep(0.1)
+		assert handler.active == 1
+		handler.permission.set()
+		await second
+		return destination
+
+	destination = asyncio.run(main())
+	assert handler.max_active == 1
+	assert destination.stream.getvalue()
+
+
+def test_runner():
+	handler = SlowHandler()
+	handler.permission.set()
+
+	async def main():
+		with ThreadPoolExecutor(1, thread_name_prefix='runner') as runner:
+			semaphore = asyncio.Semaphore(1)
+			await aio.render(make_source('case_03'), Destination(), docx, handler, CONTEXT, runner=runner)
+			await aio.render(make_source('case_03'), Destination(), docx, handler, CONTEXT, semaphore=semaphore, runner=runner)
+
+	asyncio.run(main())
+	assert handler.threads == {'runner_0'}
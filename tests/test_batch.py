@@ -0,0 +1,76 @@
+# Copyright 2021 Stepan Bakshayev
+#
+# This file is part of saganineeleven.
+#
+# saganineeleven is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License.
+#
+# saganineeleven is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with saganineeleven.  If not, see <https://www.gnu.org/licenses/>.
+import json
+from io import BytesIO
+from zipfile import ZipFile
+
+import msgpack
+import pytest
+from test_registry import write_template
+
+from saganineeleven.contrib.batch import iter_contexts, render_batch
+
+CONTEXTS = [{'var1': 'Hello,', 'var2': name, 'account': f'a{index}'} for index, name in enumerate(('Prince', 'King', 'Queen'))]
+
+
+def test_iter_contexts():
+	data = b''.join(json.dumps(c).encode() + b'\n' for c in CONTEXTS)
+	assert list(map(json.loads, iter_contexts(BytesIO(data + b'\n')))) == CONTEXTS
+	data = b''.join(map(msgpack.packb, CONTEXTS))
+	assert list(iter_contexts(BytesIO(data), 'msgpack')) == CONTEXTS
+	with pytest.raises(RuntimeError):
+		list(iter_contexts(BytesIO(data), 'xml'))
+
+
+def test_pattern(tmp_path):
+	template = write_template(tmp_path / 'template.docx', 'case_03')
+	contexts = CONTEXTS + [{'var1': 'Nobody'}]
+	summary = render_batch(str(template), 'saganineeleven.contrib.docx', 'saganineeleven.contrib.django', iter(contexts), str(tmp_path / '{account}.docx'))
+
+	assert summary.documents == 3
+	assert summary.failures == [(3, "KeyError: 'account'")]
+	for context in CONTEXTS:
+		with ZipFile(tmp_path / f'{context["account"]}.docx') as archive:
+			assert context['var2'].encode() in archive.read('word/document.xml')
+
+
+@pytest.mark.parametrize('jobs', (1, 2))
+def test_bad_record(tmp_path, jobs):
+	template = write_template(tmp_path / 'template.docx', 'case_03')
+	lines = [json.dumps(CONTEXTS[0]), '{"var1": ', '[1, 2]', 'null', json.dumps(CONTEXTS[1])]
+	data = ''.join(f'{line}\n' for line in lines).encode()
+	bundle = BytesIO()
+	summary = render_batch(str(template), 'saganineeleven.contrib.docx', 'saganineeleven.contrib.django', iter_contexts(BytesIO(data)), '{index}.docx', bundle, jobs)
+
+	assert summary.documents == 2
+	assert [(index, error.split(':')[0]) for index, error in summary.failures] == [(1, 'JSONDecodeError'), (2, 'TypeError'), (3, 'TypeError')]
+	with ZipFile(bundle) as archive:
+		assert archive.namelist() == ['0.docx', '4.docx']
+
+
+@pytest.mark.parametrize('jobs', (1, 2))
+def test_bundle(tmp_path, jobs):
+	template = write_template(tmp_path / 'template.docx', 'case_03')
+	bundle = BytesIO()
+	contexts = CONTEXTS * 5
+	summary = render_batch(str(template), 'saganineeleven.contrib.docx', 'saganineeleven.contrib.django', iter(contexts), '{index}.docx', bundle, jobs)
+
+	assert (summary.documents, summary.failures) == (15, [])
+	with ZipFile(bundle) as archive:
+		assert archive.namelist() == [f'{index}.docx' for index in range(15)]
+		for index, context in enumerate(contexts):
+			with ZipFile(BytesIO(archive.read(f'{index}.docx'))) as document:
+				assert context['var2'].encode() in document.read('word/document.xml')
@@ -0,0 +1,40 @@
+# Copyright 2021 Stepan Bakshayev
+#
+# This file is part of saganineeleven.
+#
+# saganineeleven is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License.
+#
+# saganineeleven is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with saganineeleven.  If not, see <https://www.gnu.org/licenses/>.
+import json
+from zipfile import ZipFile
+
+import pytest
+from test_render import make_docx
+
+pytest.importorskip('typer')
+pytest.importorskip('django')
+
+from saganineeleven.contrib.cli import main
+
+
+@pytest.mark.parametrize('command', ([], ['render']), ids=('default', 'render'))
+def test_render(tmp_path, command):
+	source = tmp_path / 'case_03.docx'
+	source.write_bytes(make_docx('case_03').getvalue())
+	destination = tmp_path / 'rendered.docx'
+	with pytest.raises(SystemExit) as exit:
+		main([
+			*command, '--source', str(source), '--destination', str(destination), '--document-handler', 'docx',
+			'--template-handler', 'django', '--context', json.dumps({'var1': 'Hello,', 'var2': 'Prince'}),
+		])
+	assert exit.value.code == 0
+	with ZipFile(destination) as archive:
+		assert b'Prince' in archive.read('word/document.xml')
@@ -0,0 +1,82 @@
+# Copyright 2021 Stepan Bakshayev
+#
+# This file is part of saganineeleven.
+#
+# saganineeleven is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License.
+#
+# saganineeleven is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with saganineeleven.  If not, see <https://www.gnu.org/licenses/>.
+import json
+from io import StringIO
+from threading import Thread
+from zipfile import ZipFile
+
+from test_prescan import document
+from test_registry import write_template
+
+from saganineeleven.contrib import django, docx
+from saganineeleven.contrib.daemon import Daemon, request
+from saganineeleven.registry import Registry
+
+
+def make_daemon():
+	return Daemon(docx, django, Registry(budget=10**9))
+
+
+def test_handle(tmp_path):
+	template = write_template(tmp_path / 'template.docx', 'case_03')
+	daemon = make_daemon()
+	job = {'template': str(template), 'destination': str(tmp_path / 'result.docx'), 'context': {'var1': 'Hello,', 'var2': 'Prince'}}
+
+	for _ in range(2):
+		reply = daemon.handle(job)
+		assert reply['status'] == 'ok'
+		assert set(reply['timings']) == {'template', 'render', 'total'}
+	assert daemon.registry.statistics.hits == 1
+	with ZipFile(tmp_path / 'result.docx') as archive:
+		assert b'Prince' in archive.read('word/document.xml')
+
+
+def test_handle_error(tmp_path):
+	template = write_template(tmp_path / 'template.docx', 'case_03')
+	daemon = make_daemon()
+
+	reply = daemon.handle({'template': str(tmp_path / 'missing.docx'), 'destination': str(tmp_path / 'result.docx')})
+	assert reply['status'] == 'error' and reply['error'].startswith('FileNotFoundError')
+
+	# Failed rendering does not leave destination or temporary file.
+	with ZipFile(template, 'w') as archive:
+		archive.writestr('word/document.xml', document('{% unknown %}').replace(b'xmlns:w="w"', f'xmlns:w="{docx.W}"'.encode()))
+	reply = daemon.handle({'template': str(template), 'destination': str(tmp_path / 'result.docx'), 'context': {}})
+	assert reply['status'] == 'error' and reply['error'].startswith('TemplateSyntaxError')
+	assert [p.name for p in tmp_path.iterdir()] == ['template.docx']
+
+
+def test_serve_stream(tmp_path):
+	template = write_template(tmp_path / 'template.docx', 'case_03')
+	job = json.dumps({'template': str(template), 'destination': str(tmp_path / 'result.docx')})
+	destination = StringIO()
+	make_daemon().serve_stream(StringIO(f'{job}\n\nnot json\n{job}\n'), destination)
+	assert [json.loads(line)['status'] for line in destination.getvalue().splitlines()] == ['ok', 'error', 'ok']
+
+
+def test_socket(tmp_path):
+	template = write_template(tmp_path / 'template.docx', 'case_03')
+	server = make_daemon().make_server(str(tmp_path / 'daemon.sock'))
+	thread = Thread(target=server.serve_forever)
+	thread.start()
+	try:
+		jobs = [{'template': str(template), 'destination': str(tmp_path / f'result{i}.docx'), 'context': {}} for i in range(3)]
+		assert [reply['status'] for reply in request(str(tmp_path / 'daemon.sock'), jobs)] == ['ok'] * 3
+	finally:
+		server.shutdown()
+		server.server_close()
+		thread.join()
+	assert all((tmp_path / f'result{i}.docx').exists() for i in range(3))
@@ -16,8 +16,9 @@
 from dataclasses import replace
 
 from django.conf import settings
+from django.template import Library
 
-from saganineeleven.contrib.django import Lexer
+from saganineeleven.contrib.django import Lexer, configure, get_template, render
 from saganineeleven.straighten import ShadowElement, Token, elementstr
 
 
@@ -46,3 +47,21 @@ def test_lexer():
 
 	events = tuple(map(lambda p: (p[0], str(p[1])), lexer.read_events()))
 	assert events == lexems
+
+
+register = Library()
+register.filter('shout', lambda value: f'{value.upper()}!')
+
+
+def test_render_cache():
+	template_string = '{% for c in items %}{{ c }}{% endfor %}'
+	assert render(template_string, {'items': 'ab'}) == 'ab'
+	assert render(template_string, {'items': 'cd'}) == 'cd'
+	assert get_template.cache_info().hits >= 1
+	assert get_template(template_string) is get_template(template_string)
+
+	configure(libraries={'custom': __name__})
+	try:
+		assert render('{% load custom %}{{ name|shout }}', {'name': 'prince'}) == 'PRINCE!'
+	finally:
+		configure()
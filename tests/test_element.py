@@ -15,7 +15,7 @@
 # along with saganineeleven.  If not, see <https://www.gnu.org/licenses/>.
 from dataclasses import replace
 
-from saganineeleven.straighten import ETC, ShadowElement, compress, elementstr
+from saganineeleven.straighten import ETC, ShadowElement, compress, elementrope, elementstr
 
 
 def test_elementstr_single():
@@ -93,3 +93,43 @@ def test_compress():
 		ShadowElement((0, 4), atom=-1, representation_length=37, offset=0, length=37, is_constant=True),
 		ShadowElement((0, 5), atom=-1, representation_length=16, offset=0, length=5, is_constant=False),
 	)
+
+
+def test_elementrope():
+	element = ShadowElement((0, 0), -1, 10, 0, 10, True)
+	text = ''.join(map(chr, range(ord('0'), ord('0')+element.length)))
+	estr = elementstr(text * 3)
+	estr.elements = (element,) * 3
+
+	rope = elementrope()
+	for _ in range(3):
+		chunk = elementstr(text)
+		chunk.elements = element,
+		rope += chunk
+	rope += elementstr()
+
+	assert len(rope) == len(estr)
+	assert str(rope) == str(estr)
+	assert rope.materialize().elements == estr.elements
+	for key in slice(3, 14), slice(3, -3), slice(14, -3), slice(0, None):
+		assert rope[key] == estr[key]
+		assert rope[key].elements == estr[key].elements
+
+
+def test_elementstr_bisect():
+	element = ShadowElement((0, 0), -1, 2, 0, 2, True)
+	empty = replace(element, representation_length=0, length=0)
+
+	estr = elementstr('ab' * 1000)
+	estr.elements = (element, empty) * 1000
+	assert estr[501:505].elements == (replace(element, offset=1, length=1, is_constant=False), empty, element, empty, replace(element, length=1, is_constant=False))
+	assert estr[502:504].elements == (element,)
+	assert estr[502:506].elements == (element, empty, element)
+	assert estr[502:502].elements == (replace(element, length=0, is_constant=False),)
+
+	# Cumulative lengths follow assignment of elements.
+	estr = elementstr('ab')
+	estr.elements = element,
+	assert estr[1:].elements == (replace(element, offset=1, length=1, is_constant=False),)
+	estr.elements = replace(element, length=1), replace(element, length=1)
+	assert estr[1:].elements == (replace(element, length=1, is_constant=False),)
@@ -15,24 +15,37 @@
 # along with saganineeleven.  If not, see <https://www.gnu.org/licenses/>.
 import re
 from dataclasses import astuple, dataclass
+from io import BytesIO
 from itertools import chain
 from pathlib import Path
+from time import perf_counter
 from typing import MutableSequence
-from xml.etree.ElementTree import Element, ElementTree
+from xml.etree.ElementTree import Element, ElementTree, fromstring
 from xml.etree.ElementTree import parse as xml_parse
 
 import pytest
 
-from saganineeleven.contrib import docx, odt
+from saganineeleven.contrib import docx, elementtree, odt
 from saganineeleven.contrib.django import Lexer, render
-from saganineeleven.executor import (Route, TreeBuilder, delineate_boundaries,
-                                     enforce, get_chain, get_root,
-                                     make_ending_range, make_opening_range)
+from saganineeleven.executor import (Route, StreamingTreeBuilder, TreeBuilder,
+                                     delineate_boundaries, enforce, get_chain,
+                                     get_root, make_ending_range,
+                                     make_opening_range, move_chain)
 from saganineeleven.straighten import straighten
 from saganineeleven.stringify import parse, stringify
 
+try:
+	from saganineeleven.contrib import lxml
+except ImportError:
+	lxml = None
+
 fixture_path = Path(__file__).absolute().parent / 'fixture'
 
+BACKENDS = (
+	pytest.param(elementtree, id='elementtree'),
+	pytest.param(lxml, id='lxml', marks=pytest.mark.skipif(lxml is None, reason='lxml is not installed')),
+)
+
 
 def test_get_root():
 	assert get_root('abc', 'abc') == 'abc'
@@ -63,6 +76,10 @@ namespace_re = re.compile(r'^{(?P<namespace>.*?)}(?P<name>.*?)$')
 
 
 def dataform(element: Element, namespaces: MutableSequence) -> ElementData:
+	# Frozen placeholder of origin tree is compared as its subtree.
+	thaw = getattr(element, 'thaw', None)
+	if thaw is not None:
+		element = thaw()
 	tag = element.tag
 	match = namespace_re.match(tag)
 	if match:
@@ -89,18 +106,18 @@ def dataform(element: Element, namespaces: MutableSequence) -> ElementData:
 	)
 
 
+@pytest.mark.parametrize('backend', BACKENDS)
 @pytest.mark.parametrize('path,lexer,handler', tuple(chain.from_iterable(map(parametrize_by_path, fixture_path.glob('*.odt')))))
-def test_enforce(path, lexer, handler):
+def test_enforce(path, lexer, handler, backend):
 	with path.open('br') as template_stream, (path.parent / f'{path.stem}-rendered{path.suffix}').open('rb') as paragon_stream:
-		origin_tree = xml_parse(template_stream)
-		origin_root = origin_tree.getroot()
+		origin_root = backend.fromstring(template_stream.read())
 		content, line = straighten(origin_root, lexer, handler.text_nodes, handler.convert)
 		assert content is content.template
 		namespaces = []
 		boundaries = delineate_boundaries(origin_root, line)
 
-		template = stringify(line)
-		tape = list(parse(render(template, {})))
+		template, table = stringify(line)
+		tape = list(parse(render(template, {}), table))
 
 		builder = enforce(origin_root, tape, boundaries, handler.processor_factory)
 		data = dataform(builder.destination, namespaces)
@@ -137,6 +154,25 @@ def test_making_boundaries():
 		assert routes == (Route(branch=(0, 4, 1, 1, 1, 0, 0, 0, 0, 0), crossroad=(0,)),)
 
 
+def test_move_chain():
+	with (fixture_path/'case_03.docx.xml').open('br') as stream:
+		origin_root = xml_parse(stream).getroot()
+		paths = (
+			(0, 4, 1, 1, 0, 0, 0, 7, 0, 0, 3, 0, 0, 1),
+			(0, 4, 1, 1, 1, 0, 0, 0, 0, 0, 1),
+			(0, 4, 1, 1, 1, 0, 0, 0, 0, 0, 1),
+			(0, 0, 1, 1),
+			(),
+			(0, 3, 1, 1),
+		)
+		chain = []
+		previous_path = ()
+		for path in paths:
+			move_chain(origin_root, chain, path, len(get_root(previous_path, path)))
+			assert chain == list(get_chain(origin_root, path))
+			previous_path = path
+
+
 def test_delineate_boundaries():
 	with (fixture_path/'case_03.docx.xml').open('br') as stream:
 		origin_tree = xml_parse(stream)
@@ -202,3 +238,42 @@ def test_continues(path, lexer, handler):
 				ElementTree(builder.destination).write(out, xml_declaration=True, encoding='utf-8')
 
 		assert dataform(builder.destination, namespaces) == origin_data
+
+
+def test_enforce_linear():
+	"Time of enforce grows linearly with count of loop iterations."
+	origin_root = fromstring((fixture_path/'loop_cell.docx.xml').read_text().replace("'ABC'", 'items'))
+	content, line = straighten(origin_root, Lexer, docx.text_nodes, docx.convert)
+	boundaries = delineate_boundaries(origin_root, line)
+	template, table = stringify(line)
+
+	def measure(count):
+		tape = list(parse(render(template, {'items': ['row'] * count}), table))
+		best = float('inf')
+		for _ in range(3):
+			start = perf_counter()
+			enforce(origin_root, tape, boundaries, docx.processor_factory)
+			best = min(best, perf_counter() - start)
+		return best
+
+	# Quadratic growth gives 64 times.
+	assert measure(4000) / measure(500) < 24
+
+
+@pytest.mark.parametrize('path', sorted(fixture_path.glob('*.docx.xml')), ids=lambda p: p.name)
+def test_streaming_builder(path):
+	origin_root = fromstring(path.read_bytes())
+	content, line = straighten(origin_root, Lexer, docx.text_nodes, docx.convert)
+	boundaries = delineate_boundaries(origin_root, line)
+	template, table = stringify(line)
+	# Tabulation makes new elements by processor.
+	tape = list(parse(render(template, {'var1': 'Hello,\t', 'var2': 'Prince'}), table))
+
+	paragon = BytesIO()
+	elementtree.write(enforce(origin_root, tape, boundaries, docx.processor_factory).destination, paragon)
+
+	stream = BytesIO()
+	builder = enforce(origin_root, tape, boundaries, docx.processor_factory, StreamingTreeBuilder(origin_root, elementtree.Writer(origin_root, stream)))
+	assert stream.getvalue() == paragon.getvalue()
+	# Written elements are not kept.
+	assert not builder.destination_chain and not len(builder.destination)
@@ -0,0 +1,64 @@
+# Copyright 2021 Stepan Bakshayev
+#
+# This file is part of saganineeleven.
+#
+# saganineeleven is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License.
+#
+# saganineeleven is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with saganineeleven.  If not, see <https://www.gnu.org/licenses/>.
+import os
+import subprocess
+import sys
+from pathlib import Path
+from typing import Dict
+
+import pytest
+
+root_path = Path(__file__).absolute().parent.parent
+
+# Modules are imported on demand by handlers and commands.
+HEAVY = 'saganineeleven.document', 'saganineeleven.executor', 'concurrent.futures', 'django', 'jinja2', 'lxml', 'msgpack'
+# Cumulative import time in microseconds. It is measured by `python -X importtime`, best of a few runs.
+BUDGET = {
+	'saganineeleven': 20_000,
+	'saganineeleven.contrib.daemon': 150_000,
+}
+
+
+def import_times(code: str) -> Dict[str, int]:
+	"Return cumulative import time of each module imported by code."
+	environment = {**os.environ, 'PYTHONPATH': os.pathsep.join(filter(None, (str(root_path), os.environ.get('PYTHONPATH'))))}
+	process = subprocess.run((sys.executable, '-X', 'importtime', '-c', code), env=environment, capture_output=True, text=True, check=True)
+	times = {}
+	for line in process.stderr.splitlines():
+		if not line.startswith('import time:'):
+			continue
+		_, cumulative, name = line[len('import time:'):].split('|')
+		# The first line is header.
+		if cumulative.strip().isdigit():
+			times[name.strip()] = int(cumulative)
+	return times
+
+
+@pytest.mark.parametrize('code', (
+	'import saganineeleven',
+	'import saganineeleven.contrib.daemon',
+	'import sys; sys.argv[1:] = ["--help"]; from saganineeleven.contrib.cli import application; application(standalone_mode=False)',
+), ids=('package', 'client', 'help'))
+def test_lazy(code):
+	if 'cli' in code:
+		pytest.importorskip('typer')
+	assert not set(import_times(code)) & set(HEAVY)
+
+
+@pytest.mark.parametrize('module', BUDGET)
+def test_budget(module):
+	best = min(import_times(f'import {module}')[module] for _ in range(3))
+	assert best < BUDGET[module]
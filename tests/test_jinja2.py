@@ -0,0 +1,104 @@
+# Copyright 2021 Stepan Bakshayev
+#
+# This file is part of saganineeleven.
+#
+# saganineeleven is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License.
+#
+# saganineeleven is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with saganineeleven.  If not, see <https://www.gnu.org/licenses/>.
+from io import BytesIO
+from zipfile import ZipFile
+
+import pytest
+from jinja2 import FileSystemBytecodeCache
+from test_prescan import document
+from test_render import fixture_path, make_docx, read_members
+
+from saganineeleven import render
+from saganineeleven.contrib import django, docx, jinja2
+from saganineeleven.contrib.jinja2 import Lexer, configure, get_template
+from saganineeleven.straighten import ShadowElement, Token, elementstr
+
+
+def make_chunk(index, text):
+	chunk = elementstr(text)
+	chunk.elements = ShadowElement((index,), atom=0, representation_length=len(text), offset=0, length=len(text), is_constant=True),
+	return chunk
+
+
+def lex(*texts):
+	lexer = Lexer()
+	for index, text in enumerate(texts):
+		lexer.feed(make_chunk(index, text))
+	lexer.close()
+	return tuple((t, str(e)) for t, e in lexer.read_events())
+
+
+def test_lexer():
+	assert lex("{% for c in 'ABCD' %}", "{% if c != 'C' %}character {{ c }}{% endif %}", '{% endfor %}') == (
+		(Token.terminal, "{% for c in 'ABCD' %}"),
+		(Token.terminal, "{% if c != 'C' %}"),
+		(Token.text, 'character '),
+		(Token.terminal, '{{ c }}'),
+		(Token.terminal, '{% endif %}'),
+		(Token.terminal, '{% endfor %}'),
+	)
+
+
+@pytest.mark.parametrize('texts,lexems', (
+	(("{{ {'a': '}}'}['a'] }}",), ((Token.terminal, "{{ {'a': '}}'}['a'] }}"),)),
+	(('{{ {"a": {"b": 1}', '} }}!',), ((Token.terminal, '{{ {"a": {"b": 1}} }}'), (Token.text, '!'))),
+	(("{% if '%}' %}", 'x'), ((Token.terminal, "{% if '%}' %}"), (Token.text, 'x'))),
+	(('{# }} #}', 'x{{- c -}}'), ((Token.terminal, '{# }} #}'), (Token.text, 'x'), (Token.terminal, '{{- c -}}'))),
+	(('{% raw %}{{ c', ' }}{% endraw %}'), ((Token.terminal, '{% raw %}'), (Token.text, '{{ c }}'), (Token.terminal, '{% endraw %}'))),
+	(('a {', '{ c }} b'), ((Token.text, 'a '), (Token.terminal, '{{ c }}'), (Token.text, ' b'))),
+), ids=('string', 'brackets', 'block string', 'comment', 'raw', 'splitted opener'))
+def test_lexer_syntax(texts, lexems):
+	assert lex(*texts) == lexems
+
+
+# Fixture on_style uses tag cycle of django.
+@pytest.mark.parametrize('name', sorted({p.name.split('.')[0] for p in fixture_path.glob('*.docx.xml')} - {'on_style'}))
+def test_render(name):
+	"Fixtures are written in common syntax of django and jinja."
+	context = {'var1': 'Hello,', 'var2': 'Prince'}
+	paragon = BytesIO()
+	render(make_docx(name), paragon, docx, django, context)
+	result = BytesIO()
+	render(make_docx(name), result, docx, jinja2, context)
+	assert read_members(result) == read_members(paragon)
+
+
+def test_whitespace_control():
+	"Whitespace around terminal is text of element, modifiers do not strip it."
+	source = BytesIO()
+	with ZipFile(source, 'w') as archive:
+		archive.writestr('word/document.xml', document('a   {{- name -}}   b').replace(b'xmlns:w="w"', f'xmlns:w="{docx.W}"'.encode()))
+	source.seek(0)
+	result = BytesIO()
+	render(source, result, docx, jinja2, {'name': 'X'})
+	assert b'a   X   b' in read_members(result)['word/document.xml']
+
+
+def test_bytecode_cache(tmp_path, monkeypatch):
+	template_string = '\ud8000\ud801{% for c in items %}{{ c }}\n{% endfor %}'
+	configure(FileSystemBytecodeCache(str(tmp_path)))
+	try:
+		assert jinja2.render(template_string, {'items': 'ab'}) == '\ud8000\ud801a\nb\n'
+		assert get_template(template_string) is get_template(template_string)
+		assert len(tuple(tmp_path.iterdir())) == 1
+
+		# Code is loaded from disk by new environment.
+		configure(FileSystemBytecodeCache(str(tmp_path)))
+		monkeypatch.setattr(jinja2.environment, 'compile', None)
+		assert jinja2.render(template_string, {'items': 'c'}) == '\ud8000\ud801c\n'
+		assert len(tuple(tmp_path.iterdir())) == 1
+	finally:
+		configure()
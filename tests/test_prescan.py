@@ -0,0 +1,65 @@
+# Copyright 2021 Stepan Bakshayev
+#
+# This file is part of saganineeleven.
+#
+# saganineeleven is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License.
+#
+# saganineeleven is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with saganineeleven.  If not, see <https://www.gnu.org/licenses/>.
+from pathlib import Path
+
+import pytest
+from test_render import STYLES
+
+from saganineeleven.contrib.django import prescan
+
+fixture_path = Path(__file__).absolute().parent / 'fixture'
+
+RUN = '<w:r><w:rPr><w:b w:val="true"/></w:rPr><w:t xml:space="preserve">{}</w:t></w:r>'
+
+
+def document(*texts):
+	runs = ''.join(map(RUN.format, texts))
+	return f'<?xml version="1.0" encoding="UTF-8"?><w:document xmlns:w="w"><w:body><w:p>{runs}</w:p></w:body></w:document>'.encode()
+
+
+@pytest.mark.parametrize('path', sorted(set(fixture_path.glob('*.xml*')) - set(fixture_path.glob('*-rendered.xml'))), ids=lambda p: p.name)
+def test_fixture(path):
+	assert prescan(path.read_bytes())
+
+
+@pytest.mark.parametrize('data', (
+	STYLES,
+	document('50% and #1', 'Hello, {name}!', 'x }'),
+	document('{x}', '}'),
+	'<?xml version="1.0"?><a b="{}" c="}}"><!-- { --></a>'.encode(),
+), ids=('styles', 'braces', 'closers', 'attribute'))
+def test_plaintext(data):
+	assert not prescan(data)
+
+
+@pytest.mark.parametrize('data', (
+	document('{% if x %}'),
+	document('{{ x }}'),
+	document('{# x #}'),
+	document('text {', '% if x %}'),
+	document('text {', '', '{ x }}'),
+	document('{', '</w:t><w:delText>x</w:delText><w:t>', '{ name }}'),
+	document('{', '</w:t><w:instrText> PAGE </w:instrText><w:t>', '% if x %}'),
+	document('{x{', '}'),
+	document('&#123;% if x %}'),
+	document('{&#x25; if x %}'),
+	document('&#X7b;&#x7B; x }}'),
+	'<?xml version="1.0"?><a>{<b c="&gt;>" d=\'"\'/><!-- > --><?pi >?>%</a>'.encode(),
+	'<?xml version="1.0"?><a><![CDATA[{]]>%</a>'.encode(),
+	'<?xml version="1.0" encoding="UTF-16"?><a>{%</a>'.encode('utf-16'),
+), ids=('block', 'variable', 'comment', 'splitted', 'empty run', 'deleted text', 'instruction text', 'text between', 'decimal', 'hex', 'hex case', 'markup', 'cdata', 'utf-16'))
+def test_template(data):
+	assert prescan(data)
@@ -0,0 +1,73 @@
+# Copyright 2021 Stepan Bakshayev
+#
+# This file is part of saganineeleven.
+#
+# saganineeleven is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License.
+#
+# saganineeleven is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with saganineeleven.  If not, see <https://www.gnu.org/licenses/>.
+from os import utime
+
+from test_render import make_docx
+
+from saganineeleven.contrib import django, docx
+from saganineeleven.registry import Registry, Statistics, measure
+
+
+def write_template(path, name):
+	path.write_bytes(make_docx(name).getvalue())
+	return path
+
+
+def test_path(tmp_path):
+	path = write_template(tmp_path / 'template.docx', 'case_03')
+	registry = Registry(budget=10**9)
+
+	template = registry.get(path, docx, django)
+	assert registry.get(path, docx, django) is template
+	assert registry.statistics == Statistics(hits=1, misses=1, evictions=0, entries=1, size=measure(template))
+
+	# The same content with other modification time.
+	utime(path, ns=(0, 0))
+	assert registry.get(path, docx, django) is template
+	assert registry.statistics.hits == 2
+
+	write_template(path, 'loop_cell')
+	changed = registry.get(path, docx, django)
+	assert changed is not template
+	assert changed.parts[1] is template.parts[1]
+	assert registry.statistics.misses == 2
+	assert registry.statistics.entries == 1
+
+
+def test_key():
+	registry = Registry(budget=10**9)
+	template = registry.get('contract', docx, django, source=make_docx('case_03'))
+	assert registry.get('contract', docx, django, source=make_docx('case_03')) is template
+	assert registry.get('contract', docx, django, source=make_docx('loop_cell')) is not template
+	assert (registry.statistics.hits, registry.statistics.misses) == (1, 2)
+
+
+def test_eviction():
+	names = 'case_03', 'loop_cell', 'on_style'
+	budget = max(measure(Registry(budget=10**9).get(name, docx, django, source=make_docx(name))) for name in names) * 2
+	registry = Registry(budget=budget)
+
+	for name in names:
+		registry.get(name, docx, django, source=make_docx(name))
+	assert registry.statistics.evictions == 1
+	assert registry.statistics.size <= budget
+	assert list(key for key, *_ in registry.entries) == ['loop_cell', 'on_style']
+
+	# Recently used entry survives.
+	registry.get('loop_cell', docx, django, source=make_docx('loop_cell'))
+	registry.get('case_03', docx, django, source=make_docx('case_03'))
+	assert list(key for key, *_ in registry.entries) == ['loop_cell', 'case_03']
+	assert registry.statistics.evictions == 2
@@ -0,0 +1,191 @@
+# Copyright 2021 Stepan Bakshayev
+#
+# This file is part of saganineeleven.
+#
+# saganineeleven is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License.
+#
+# saganineeleven is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with saganineeleven.  If not, see <https://www.gnu.org/licenses/>.
+import pickle
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+from pathlib import Path
+from xml.etree.ElementTree import fromstring
+from zipfile import ZIP_DEFLATED, ZIP_STORED, ZipFile
+
+import pytest
+from test_executor import dataform, lxml
+
+from saganineeleven import compile, render
+from saganineeleven.contrib import django, docx, elementtree
+from saganineeleven.document import Part, make_part, prepare, write_part
+from saganineeleven.straighten import ContentType
+
+fixture_path = Path(__file__).absolute().parent / 'fixture'
+
+STYLES = b'<?xml version="1.0" encoding="UTF-8"?><w:styles xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main"/>'
+IMAGE = bytes(range(256)) * 64
+DECLARATION_LENGTH = len(b"<?xml version='1.0' encoding='utf-8'?>")
+# Namespaces are declared below root as Word does. Drawing is copied deep, wrapper is copied on path to text.
+DRAWING = (
+	b'<ns0:p><ns0:r><ns0:drawing>'
+	b'<pic:pic xmlns:pic="http://schemas.openxmlformats.org/drawingml/2006/picture"><pic:blipFill>'
+	b'<a14:useLocalDpi xmlns:a14="http://schemas.microsoft.com/office/drawing/2010/main"/>'
+	b'</pic:blipFill></pic:pic>'
+	b'</ns0:drawing></ns0:r>'
+	b'<x:wrap xmlns:x="urn:saganineeleven:wrap"><ns0:r><ns0:t>{{ var2 }}</ns0:t></ns0:r></x:wrap></ns0:p>'
+)
+
+
+def make_docx(name: str, body: bytes = b'') -> BytesIO:
+	"Wrap fixture into minimal archive with passthrough members around. Body is inserted in the beginning of body."
+	stream = BytesIO()
+	data = (fixture_path / f'{name}.docx.xml').read_bytes().replace(b'<ns0:body>', b'<ns0:body>' + body, 1)
+	with ZipFile(stream, 'w') as archive:
+		archive.writestr('word/document.xml', data, ZIP_DEFLATED)
+		archive.writestr('word/styles.xml', STYLES, ZIP_DEFLATED, compresslevel=1)
+		archive.writestr('word/media/image1.png', IMAGE, ZIP_STORED)
+	stream.seek(0)
+	return stream
+
+
+def read_members(stream: BytesIO) -> dict:
+	stream.seek(0)
+	with ZipFile(stream) as archive:
+		return {info.filename: archive.read(info) for info in archive.infolist()}
+
+
+def test_compile():
+	compiled = compile(make_docx('case_03'), docx, django)
+
+	assert tuple(p.name for p in compiled.parts) == ('word/document.xml', 'word/styles.xml', 'word/media/image1.png')
+	document, styles, image = compiled.parts
+	assert document.content_type is ContentType.template
+	assert document.template and document.line and document.boundaries
+	assert styles.content_type is ContentType.plaintext
+	assert image.content_type is ContentType.plaintext
+	assert image.data == IMAGE
+
+
+def test_render_many():
+	compiled = compile(make_docx('case_03'), docx, django)
+
+	for context in {'var1': 'Hello,', 'var2': 'Prince'}, {'var1': 'Goodbye,', 'var2': 'King'}:
+		paragon = BytesIO()
+		render(make_docx('case_03'), paragon, docx, django, context)
+		result = BytesIO()
+		compiled.render(context, result)
+
+		members = read_members(result)
+		assert members == read_members(paragon)
+		assert members['word/styles.xml'] == STYLES
+		assert members['word/media/image1.png'] == IMAGE
+		assert context['var2'].encode() in members['word/document.xml']
+
+
+def test_raw_passthrough():
+	source = make_docx('case_03')
+	result = BytesIO()
+	render(source, result, docx, django, {})
+
+	with ZipFile(source) as origin, ZipFile(result) as archive:
+		assert archive.testzip() is None
+		for name in 'word/styles.xml', 'word/media/image1.png':
+			origin_info, info = origin.getinfo(name), archive.getinfo(name)
+			assert (info.compress_type, info.CRC, info.compress_size, info.file_size, info.date_time) == \
+				(origin_info.compress_type, origin_info.CRC, origin_info.compress_size, origin_info.file_size, origin_info.date_time)
+		assert archive.getinfo('word/document.xml').compress_type == ZIP_DEFLATED
+
+
+def test_executor():
+	source = BytesIO()
+	with ZipFile(make_docx('case_03')) as origin, ZipFile(source, 'w') as archive:
+		for info in origin.infolist():
+			archive.writestr(info, origin.read(info))
+		archive.writestr('word/header1.xml', (fixture_path / 'loop_cell.docx.xml').read_bytes())
+		archive.writestr('word/footer1.xml', (fixture_path / 'objects_display.docx.xml').read_bytes())
+
+	context = {'var1': 'Hello,', 'var2': 'Prince'}
+	paragon = BytesIO()
+	source.seek(0)
+	render(source, paragon, docx, django, context)
+
+	result = BytesIO()
+	source.seek(0)
+	with ProcessPoolExecutor(2) as executor:
+		render(source, result, docx, django, context, executor=executor)
+
+	with ZipFile(result) as archive:
+		assert archive.namelist() == ['word/document.xml', 'word/styles.xml', 'word/media/image1.png', 'word/header1.xml', 'word/footer1.xml']
+	assert read_members(result) == read_members(paragon)
+
+
+@pytest.mark.skipif(lxml is None, reason='lxml is not installed')
+@pytest.mark.parametrize('name', sorted(p.name.split('.')[0] for p in fixture_path.glob('*.docx.xml')))
+def test_lxml_backend(name):
+	context = {'var1': 'Hello,', 'var2': 'Prince'}
+	paragon = BytesIO()
+	render(make_docx(name, DRAWING), paragon, docx, django, context)
+	result = BytesIO()
+	render(make_docx(name, DRAWING), result, docx, django, context, backend=lxml)
+
+	paragon_members, members = read_members(paragon), read_members(result)
+	assert members.keys() == paragon_members.keys()
+	for member, data in members.items():
+		assert data[:DECLARATION_LENGTH] == paragon_members[member][:DECLARATION_LENGTH]
+		if member.endswith('.xml'):
+			assert dataform(lxml.fromstring(data), []) == dataform(fromstring(paragon_members[member]), [])
+		else:
+			assert data == paragon_members[member]
+	# Prefixes are kept.
+	with ZipFile(make_docx(name, DRAWING)) as archive:
+		origin = lxml.fromstring(archive.read('word/document.xml'))
+	assert lxml.fromstring(members['word/document.xml']).nsmap == origin.nsmap
+	for declaration in (b'<pic:pic xmlns:pic=', b'<a14:useLocalDpi xmlns:a14=', b'<x:wrap xmlns:x='):
+		assert members['word/document.xml'].count(declaration) == 1
+	assert b'<ns0:t>Prince</ns0:t></ns0:r></x:wrap>' in members['word/document.xml']
+
+	# Trees of lxml are pickled for process executor.
+	result = BytesIO()
+	with ProcessPoolExecutor(2) as executor:
+		render(make_docx(name, DRAWING), result, docx, django, context, executor=executor, backend=lxml)
+	assert read_members(result) == members
+
+
+@pytest.mark.skipif(lxml is None, reason='lxml is not installed')
+def test_lxml_pickle():
+	"Module does not change pickling of lxml elements for the whole process."
+	from copyreg import dispatch_table
+	from lxml.etree import _Element
+
+	assert _Element not in dispatch_table
+	with pytest.raises(TypeError):
+		pickle.dumps(lxml.fromstring(b'<a/>'))
+
+	root = lxml.fromstring(b'<a><b>text</b>tail<c/></a>')
+	child = root[0]
+	assert lxml.tostring(lxml.fromstring(lxml.tostring(child))) == b'<b>text</b>'
+	assert lxml.tostring(lxml.fromstring(lxml.tostring(root))) == lxml.tostring(root)
+
+
+@pytest.mark.parametrize('name', sorted(p.name.split('.')[0] for p in fixture_path.glob('*.docx.xml')))
+def test_frozen_tree(name):
+	"Render over frozen tree is the same as over complete tree."
+	data = (fixture_path / f'{name}.docx.xml').read_bytes()
+	context = {'var1': 'Hello,', 'var2': 'Prince'}
+	outputs = []
+	for freeze in None, elementtree.freeze:
+		plaintext = Part('word/document.xml', b'', b'', ContentType.plaintext)
+		part = make_part(plaintext, prepare(data, django.Lexer, docx.text_nodes, docx.convert, elementtree.iterparse, freeze))
+		for Writer in None, elementtree.Writer:
+			stream = BytesIO()
+			write_part(part, django.render, docx.processor_factory, context, stream, Writer=Writer)
+			outputs.append(stream.getvalue())
+	assert len(set(outputs)) == 1
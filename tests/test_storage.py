@@ -0,0 +1,102 @@
+# Copyright 2021 Stepan Bakshayev
+#
+# This file is part of saganineeleven.
+#
+# saganineeleven is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License.
+#
+# saganineeleven is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with saganineeleven.  If not, see <https://www.gnu.org/licenses/>.
+from io import BytesIO
+from zipfile import ZipFile
+
+import pytest
+from test_executor import dataform, lxml
+from test_render import DRAWING, fixture_path, make_docx, read_members
+
+from saganineeleven import compile
+from saganineeleven.contrib import django, docx, jinja2, odt
+from saganineeleven.storage import dump, load
+
+
+def test_dump_load(tmp_path):
+	compiled = compile(make_docx('loop_cell'), docx, django)
+	path = tmp_path / 'loop_cell.s9n11'
+	with path.open('wb') as stream:
+		dump(compiled, stream)
+	with path.open('rb') as stream:
+		loaded = load(stream, docx, django)
+
+	assert [(p.name, p.digest, p.content_type) for p in loaded.parts] == [(p.name, p.digest, p.content_type) for p in compiled.parts]
+	for origin, part in zip(compiled.parts, loaded.parts):
+		assert part.line == origin.line
+		assert part.boundaries == origin.boundaries
+		assert part.template == origin.template
+		assert part.table == origin.table
+		assert bytes(part.data) == origin.data
+		if origin.root is not None:
+			assert dataform(part.root, []) == dataform(origin.root, [])
+
+	paragon = BytesIO()
+	compiled.render({}, paragon)
+	result = BytesIO()
+	loaded.render({}, result)
+	assert read_members(result) == read_members(paragon)
+
+	with path.open('rb') as stream, pytest.raises(RuntimeError):
+		load(stream, odt, django)
+
+
+def test_reuse_unchanged_parts():
+	compiled = compile(make_docx('case_03'), docx, django)
+
+	source = make_docx('case_03')
+	changed = BytesIO()
+	with ZipFile(source) as archive, ZipFile(changed, 'w') as new:
+		for info in archive.infolist():
+			data = archive.read(info)
+			if info.filename == 'word/media/image1.png':
+				data = data[::-1]
+			new.writestr(info, data)
+	changed.seek(0)
+
+	recompiled = compile(changed, docx, django, previous=compiled)
+	document, styles, image = recompiled.parts
+	assert document is compiled.parts[0]
+	assert styles is compiled.parts[1]
+	assert image is not compiled.parts[2]
+	assert image.digest != compiled.parts[2].digest
+
+	# Parts of other handler are not reused.
+	recompiled = compile(make_docx('case_03'), docx, jinja2, previous=compiled)
+	assert not set(map(id, recompiled.parts)) & set(map(id, compiled.parts))
+
+
+@pytest.mark.skipif(lxml is None, reason='lxml is not installed')
+def test_load_lxml(tmp_path):
+	data = (fixture_path / 'case_03.docx.xml').read_bytes().replace(b'<ns0:body>', b'<ns0:body>' + DRAWING).replace(b'ns0:', b'w:').replace(b'xmlns:ns0=', b'xmlns:w=')
+	source = BytesIO()
+	with ZipFile(source, 'w') as archive:
+		archive.writestr('word/document.xml', data)
+	source.seek(0)
+	compiled = compile(source, docx, django, backend=lxml)
+	path = tmp_path / 'case_03.s9n11'
+	with path.open('wb') as stream:
+		dump(compiled, stream)
+	with path.open('rb') as stream:
+		loaded = load(stream, docx, django, lxml)
+
+	context = {'var1': 'Hello,', 'var2': 'Prince'}
+	paragon = BytesIO()
+	compiled.render(context, paragon)
+	result = BytesIO()
+	loaded.render(context, result)
+	assert read_members(result) == read_members(paragon)
+	assert read_members(result)['word/document.xml'].startswith(b"<?xml version='1.0' encoding='utf-8'?>\n<w:document ")
+	assert b'<x:wrap xmlns:x="urn:saganineeleven:wrap"><w:r><w:t>Prince</w:t>' in read_members(result)['word/document.xml']
@@ -13,14 +13,22 @@
 #
 # You should have received a copy of the GNU General Public License
 # along with saganineeleven.  If not, see <https://www.gnu.org/licenses/>.
-from io import StringIO
+from io import BytesIO, StringIO
+from operator import itemgetter
+from pathlib import Path
+from xml.etree.ElementTree import fromstring
 
 import pytest
 
+from test_executor import BACKENDS, dataform
+
+from saganineeleven.contrib import django, docx, elementtree, jinja2, odt
 from saganineeleven.contrib.django import Lexer
 from saganineeleven.contrib.docx import convert, text_nodes
-from saganineeleven.straighten import (ETC, ContentType, ShadowElement,
-                                       straighten)
+from saganineeleven.straighten import (ETC, BufferedLexer, ContentType, ShadowElement, Token, elementstr,
+                                       iterstraighten, straighten, travel)
+
+fixture_path = Path(__file__).absolute().parent / 'fixture'
 
 
 @pytest.mark.skip(reason='until make decision about compress in pipeline')
@@ -115,3 +123,85 @@ def test_all_terminals_present():
 		('.', (ShadowElement(path=(0, 5, 1,), atom=-1, representation_length=16, offset=15, length=1, is_constant=False),)),
 	]
 	assert list(map(lambda t: (str(t), t.elements), text)) == template_element
+
+
+def test_travel():
+	root = fromstring('<a><b><c/><t><d/></t></b><e/><t/></a>')
+	assert [(path, element.tag) for path, element in travel(root)] == [
+		((), 'a'), ((0,), 'b'), ((0, 0), 'c'), ((0, 1), 't'), ((0, 1, 0), 'd'), ((1,), 'e'), ((2,), 't'),
+	]
+	assert [(path, element.tag) for path, element in travel(root, {'t'})] == [
+		((), 'a'), ((0,), 'b'), ((0, 0), 'c'), ((0, 1), 't'), ((1,), 'e'), ((2,), 't'),
+	]
+	assert [(path, element.tag) for path, element in travel(root, {'a'})] == [((), 'a')]
+
+
+@pytest.mark.parametrize('backend', BACKENDS)
+@pytest.mark.parametrize('path', sorted(fixture_path.glob('*.xml')), ids=lambda p: p.name)
+def test_iterstraighten(path, backend):
+	handler = docx if '.docx' in path.name else odt
+	data = path.read_bytes()
+	root, content_type, line = iterstraighten(BytesIO(data), Lexer, handler.text_nodes, handler.convert, backend.iterparse)
+	assert (content_type, line) == straighten(backend.fromstring(data), Lexer, handler.text_nodes, handler.convert)
+	assert root.tag == backend.fromstring(data).tag
+
+
+@pytest.mark.parametrize('path', sorted(fixture_path.glob('*.xml')), ids=lambda p: p.name)
+def test_iterstraighten_freeze(path):
+	handler = docx if '.docx' in path.name else odt
+	data = path.read_bytes()
+	root, content_type, line = iterstraighten(BytesIO(data), Lexer, handler.text_nodes, handler.convert, elementtree.iterparse, elementtree.freeze)
+	assert (content_type, line) == straighten(fromstring(data), Lexer, handler.text_nodes, handler.convert)
+	assert dataform(root, []) == dataform(fromstring(data), [])
+	# Elements on paths of texts are kept.
+	for pointer, _ in line:
+		node = root
+		for index in pointer.path:
+			node = node[index]
+			assert node.tag != elementtree.FROZEN
+
+
+def test_freeze():
+	data = (
+		b'<a><b><p><x/></p><t>1</t></b><c><d><e/></d></c><b><p><x/></p><t>2</t></b>'
+		b'<b><p><x/></p></b><b><t><q><y/></q></t></b></a>'
+	)
+	root, _, line = iterstraighten(BytesIO(data), Lexer, {'t': 0}, lambda e: (((), e.text or ''),), elementtree.iterparse, elementtree.freeze)
+	first, c, second, empty, no_text = root
+	assert [e.tag for e in first] == [elementtree.FROZEN, 't']
+	assert c.tag == empty.tag == elementtree.FROZEN
+	# Equal subtrees share placeholder.
+	assert first[0] is second[0]
+	# Text node is copied deep, its children are frozen.
+	assert no_text[0].tag == 't'
+	assert no_text[0][0].tag == elementtree.FROZEN
+	assert dataform(root, []) == dataform(fromstring(data), [])
+
+
+@pytest.mark.parametrize('handler', (django, jinja2), ids=('django', 'jinja2'))
+def test_lexer_drain(handler):
+	runs = 10000
+	texts = ['Lorem ipsum dolor sit amet. '] * runs
+	# Terminal is splitted across runs.
+	texts[runs // 2:runs // 2 + 2] = '{% if True %}{', '{ c }}'
+	lexer = handler.Lexer()
+	for index, text in enumerate(texts):
+		chunk = elementstr(text)
+		chunk.elements = ShadowElement((index,), atom=0, representation_length=len(text), offset=0, length=len(text), is_constant=True),
+		lexer.feed(chunk)
+		# Text without terminals is not accumulated.
+		assert len(lexer.buffer) <= len('{% if True %}{{ c }}')
+
+	lexer.close()
+	events = tuple(lexer.read_events())
+	assert ''.join(map(str, map(itemgetter(1), events))) == ''.join(texts)
+	assert tuple((t, str(e)) for t, e in events if t is Token.terminal) == ((Token.terminal, '{% if True %}'), (Token.terminal, '{{ c }}'))
+	assert sum(len(e.elements) for _, e in events) == runs + 1
+
+
+def test_lexer_abstract():
+	class Lexer(BufferedLexer):
+		opener_re = django.opener_re
+
+	with pytest.raises(TypeError):
+		Lexer()
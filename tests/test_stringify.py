@@ -19,10 +19,10 @@ from saganineeleven.straighten import ETC, ElementPointer
 from saganineeleven.stringify import parse, stringify
 
 
-def test():
+def make_line():
 	indexer = count(1)
 	# XXX: Test does not require ElementPointer semantically correction.
-	line = [
+	return [
 		(ElementPointer(path=(0, 0, 1,), index=next(indexer), is_constant=True), 'Hello,',),
 		(ElementPointer(path=(0, 1, 1,), index=next(indexer), is_constant=False), '{{ name }}',),
 		(ElementPointer(path=(0, 1, 1,), index=next(indexer), is_constant=False), f"!",),
@@ -31,5 +31,29 @@ def test():
 		(ElementPointer(path=(0, 5, 1,), index=next(indexer), is_constant=False), f"Buy, ",),
 		(ElementPointer(path=(0, 5, 1,), index=next(indexer), is_constant=False), '{{ name }}',),
 		(ElementPointer(path=(0, 5, 1,), index=next(indexer), is_constant=False), '.',),
+		(ElementPointer(path=(0, 6, 1,), index=next(indexer), is_constant=True), '',),
 	]
-	assert list(parse(stringify(line))) == line
+
+
+def test():
+	line = make_line()
+	template, table = stringify(line)
+	assert list(parse(template, table)) == line
+	assert table == tuple(pointer for pointer, _ in line)
+	assert template.startswith('\ud8000\ud801Hello,\ud8001\ud801{{ name }}')
+
+	# Equal pointers share index.
+	pointer = ElementPointer(path=(0,), index=1, is_constant=False)
+	template, table = stringify([(pointer, 'a'), (pointer, 'b')])
+	assert table == (pointer,)
+	assert list(parse(template * 2, table)) == [(pointer, 'a'), (pointer, 'b')] * 2
+
+
+def test_chunks():
+	line = make_line()
+	tape, table = stringify(line)
+	for size in range(1, 16):
+		chunks = (tape[i:i+size] for i in range(0, len(tape), size))
+		assert list(parse(chunks, table)) == line
+	assert list(parse(['', 'prelude', tape, ''], table)) == line
+	assert list(parse(iter(tape), table)) == line
@@ -0,0 +1,87 @@
+# Copyright 2021 Stepan Bakshayev
+#
+# This file is part of saganineeleven.
+#
+# saganineeleven is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License.
+#
+# saganineeleven is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with saganineeleven.  If not, see <https://www.gnu.org/licenses/>.
+from io import BytesIO
+from xml.etree.ElementTree import fromstring
+from zipfile import ZIP_STORED, ZipFile
+
+import pytest
+
+from saganineeleven import compile, render
+from saganineeleven.contrib import django, docx, jinja2, odt
+from saganineeleven.contrib.synthetic import DOCX, ODT, ODT_MIMETYPE, Shape, make_content, make_context, write
+from saganineeleven.straighten import ContentType
+
+W = '{http://schemas.openxmlformats.org/wordprocessingml/2006/main}'
+TEXT = '{urn:oasis:names:tc:opendocument:xmlns:text:1.0}'
+
+
+def test_shape():
+	shape = Shape(paragraphs=10, runs=4, depth=2, rows=5, cells=2, variables=1)
+	root = fromstring(make_content(shape))
+	assert make_content(shape) == make_content(shape)
+
+	body = root.find(f'{W}body')
+	for _ in range(shape.depth):
+		table = body[0]
+		assert table.tag == f'{W}tbl'
+		body = table.find(f'{W}tr/{W}tc')
+	# Cell of nesting table ends with empty paragraph.
+	assert len(body.findall(f'{W}p')) == shape.paragraphs + 1
+	table = body.find(f'{W}tbl')
+	assert len(table.findall(f'{W}tr')) == shape.rows
+	assert all(len(row.findall(f'{W}tc')) == shape.cells for row in table.iter(f'{W}tr'))
+	assert len(root.findall(f'.//{W}r')) == (shape.paragraphs + shape.rows * shape.cells) * shape.runs
+	assert {r.findtext(f'{W}t') for r in root.iter(f'{W}r')} == {'{{ name }}'}
+
+
+@pytest.mark.parametrize('template_handler', (django, jinja2))
+def test_render(template_handler):
+	shape = Shape(paragraphs=20, rows=10, depth=1, split=.5, loops=.3, conditions=.3, items=2)
+	source = BytesIO()
+	write(shape, source)
+	with ZipFile(source) as archive:
+		assert archive.namelist() == ['[Content_Types].xml', '_rels/.rels', DOCX.content_name]
+
+	source.seek(0)
+	result = BytesIO()
+	render(source, result, docx, template_handler, make_context(shape))
+	with ZipFile(result) as archive:
+		root = fromstring(archive.read(DOCX.content_name))
+	texts = [t.text for t in root.iter(f'{W}t')]
+	assert not any('{' in t or '}' in t for t in texts)
+	assert 'Prince' in texts
+	assert {'item 0', 'item 1'} <= set(texts)
+	# Every paragraph and row with item is copied for each item.
+	assert texts.count('item 0') == texts.count('item 1')
+
+
+def test_odt():
+	shape = Shape(paragraphs=5, rows=3, depth=1, split=1, loops=1)
+	source = BytesIO()
+	write(shape, source, ODT)
+	with ZipFile(source) as archive:
+		mimetype = archive.infolist()[0]
+		assert (mimetype.filename, mimetype.compress_type) == ('mimetype', ZIP_STORED)
+		assert archive.read(mimetype) == ODT_MIMETYPE
+		root = fromstring(archive.read(ODT.content_name))
+	assert {'{{ na', 'me }}'} <= {t for p in root.iter(f'{TEXT}p') for t in p.itertext()}
+
+	source.seek(0)
+	compiled = compile(source, odt, django)
+	assert {p.name: p.content_type for p in compiled.parts} == {
+		'META-INF/manifest.xml': ContentType.plaintext,
+		ODT.content_name: ContentType.template,
+	}
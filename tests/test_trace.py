@@ -0,0 +1,72 @@
+# Copyright 2021 Stepan Bakshayev
+#
+# This file is part of saganineeleven.
+#
+# saganineeleven is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License.
+#
+# saganineeleven is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with saganineeleven.  If not, see <https://www.gnu.org/licenses/>.
+import json
+from io import BytesIO, StringIO
+
+import pytest
+from test_render import make_docx
+
+from saganineeleven import render
+from saganineeleven.contrib import django, docx
+from saganineeleven.trace import ChromeTracer, DictTracer
+
+CONTEXT = {'var1': 'Hello,', 'var2': 'Prince'}
+DOCUMENT = 'word/document.xml'
+
+
+def test_dict_tracer():
+	tracer = DictTracer()
+	render(make_docx('case_03'), BytesIO(), docx, django, CONTEXT, tracer=tracer)
+
+	assert not tracer.stack
+	assert set(tracer.stages) == {
+		'compile', 'zip_read', 'prescan', 'iterstraighten', 'delineate_boundaries', 'stringify',
+		'render', 'zip_write', 'template_render', 'enforce',
+	}
+	assert tracer.stages['zip_read'].count == tracer.stages['zip_write'].count == 3
+	assert tracer.stages['template_render'].count == 1
+	whole = tracer.stages['compile'].seconds + tracer.stages['render'].seconds
+	assert sum(s.self_seconds for s in tracer.stages.values()) == pytest.approx(whole)
+
+	document = tracer.parts[DOCUMENT]
+	assert document['iterstraighten']['line'] > 0 and document['stringify']['template'] > 0
+	assert document['template_render']['rendered'] > 0 and document['enforce']['seconds'] > 0
+	assert document['zip_read']['size'] > document['zip_read']['compress_size'] > 0
+	assert document['zip_write']['size'] > document['zip_write']['compress_size'] > 0
+	assert document['iterstraighten']['size'] == document['zip_read']['size']
+	assert 'iterstraighten' not in tracer.parts['word/media/image1.png']
+
+
+def test_dict_tracer_mismatch():
+	tracer = DictTracer()
+	tracer.start('render')
+	tracer.start('zip_write', DOCUMENT)
+	with pytest.raises(RuntimeError):
+		tracer.end('render')
+
+
+def test_chrome_tracer():
+	tracer = ChromeTracer()
+	render(make_docx('case_03'), BytesIO(), docx, django, CONTEXT, tracer=tracer)
+	stream = StringIO()
+	tracer.write(stream)
+
+	events = json.loads(stream.getvalue())['traceEvents']
+	assert [e['ph'] for e in events].count('B') == [e['ph'] for e in events].count('E')
+	assert events[0]['name'] == 'compile' and events[-1]['name'] == 'render'
+	assert [e['ts'] for e in events] == sorted(e['ts'] for e in events)
+	begin, = (e for e in events if e['ph'] == 'B' and e['name'] == 'template_render')
+	assert begin['args'] == {'part': DOCUMENT}